@@ -2,6 +2,8 @@ import json
 import os
 import logging
 
+from local_scanner import DEFAULT_SAVE_EXTENSIONS
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,7 +14,54 @@ class ConfigManager:
             "delta_db_path": "",
             "dropbox_token": "",
             "dropbox_folder_path": "",
-            "local_saves_path": ""
+            "local_saves_path": "",
+            # bytes per second, 0 means unlimited
+            "upload_rate_limit": 0,
+            "download_rate_limit": 0,
+            # syncs with at most this many files jump ahead of bulk syncs
+            "interactive_sync_threshold": 5,
+            # write cProfile/tracemalloc reports for every sync run
+            "profiling_enabled": False,
+            "diagnostics_path": "diagnostics",
+            # save file types in order of precedence, first match wins
+            "save_extensions": list(DEFAULT_SAVE_EXTENSIONS),
+            "scan_subfolders": True,
+            "scan_workers": 4,
+            # copies of every save version we overwrite, see snapshot_store.py
+            "snapshot_path": "snapshots",
+            "snapshot_max_bytes": 256 * 1024 * 1024,
+            "snapshot_max_age_days": 30,
+            "snapshot_remote_before_upload": True,
+            # save states are snapshotted into <snapshot_path>/states, their
+            # remote copy only if asked since that is a full extra download
+            "state_snapshot_max_bytes": 256 * 1024 * 1024,
+            "state_snapshot_remote_before_upload": False,
+            # "dropbox" or "local" (a local or mounted folder at local_backend_path)
+            "storage_backend": "dropbox",
+            "local_backend_path": "",
+            # overlap the database load with the local and remote scans
+            "pipelined_scan": True,
+            # sync Delta save states too, kept locally in this subfolder
+            "sync_save_states": True,
+            "save_states_folder": "Save States",
+            # games to sync by name, identifier or glob pattern (empty = all)
+            "include_games": [],
+            "exclude_games": [],
+            # fast mode: only games played in the last N days, 0 = all games
+            "recent_days": 0,
+            # sync event log, see sync_log.py
+            "log_level": "INFO",
+            "log_buffer_size": 5000,
+            "log_file": os.path.join("diagnostics", "sync.log"),
+            "log_max_bytes": 1024 * 1024,
+            "log_backup_count": 3,
+            # extra libraries synced by orchestrator.py, each one a dict that
+            # overrides the keys above, e.g. {"name": ..., "delta_db_path": ...}
+            "profiles": [],
+            "max_parallel_profiles": 4,
+            "transfer_workers": 4,
+            "hash_workers": 2,
+            "http_max_connections": 8
         }
         self.load_config()
         
@@ -22,11 +71,30 @@ class ConfigManager:
         self.config[config] = value
         self.save_config()
     
+    def profiles(self):
+        """Config views for every library in the profiles section"""
+        return [ProfileConfig(self, profile, f"profile-{i}")
+                for i, profile in enumerate(self.config.get("profiles", []))]
+
+    def libraries(self):
+        """Every library to sync: the top level one, if set up, then the profiles
+
+        The top level library is left out when a profile already points at
+        its database, so it is never synced twice.
+        """
+        libraries = self.profiles()
+        db_path = self.config.get("delta_db_path")
+        if db_path and all(p.config.get("delta_db_path") != db_path
+                           for p in libraries):
+            libraries.insert(0, ProfileConfig(self, {}, "default", top_level=True))
+        return libraries
+
     def load_config(self):
         if os.path.exists(self.config_path):
             try:
                 with open(self.config_path, 'r') as f:
-                    self.config = json.load(f)
+                    # keep defaults for keys older configs don't have yet
+                    self.config.update(json.load(f))
                 return True
             except Exception as e:
                 logger.error(f"Error loading config: {e}")
@@ -39,4 +107,41 @@ class ConfigManager:
             return True
         except Exception as e:
             logger.error(f"Error saving config: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+class ProfileConfig:
+    """Config for one library in the profiles section
+
+    Reads fall back to the top level config, writes go into the profile.
+    A top_level view stands for the library configured outside profiles,
+    it keeps the top level snapshot folder and writes to the top level.
+    """
+
+    def __init__(self, parent: ConfigManager, profile, default_name, top_level=False):
+        self.parent = parent
+        self.profile = profile
+        self.name = profile.get("name") or default_name
+        self.top_level = top_level
+        self._merged = None
+
+    @property
+    def config(self):
+        """Merged once per view, ConfigManager.profiles() hands out fresh views"""
+        if self._merged is None:
+            merged = dict(self.parent.config)
+            merged.pop("profiles", None)
+            if not self.top_level:
+                # each library keeps its own snapshot index
+                merged["snapshot_path"] = os.path.join(merged["snapshot_path"], self.name)
+            merged.update(self.profile)
+            self._merged = merged
+        return self._merged
+
+    def set_config(self, config, value):
+        self._merged = None
+        if self.top_level:
+            self.parent.set_config(config, value)
+            return
+        self.profile[config] = value
+        self.parent.save_config()
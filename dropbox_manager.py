@@ -4,19 +4,52 @@ import os
 from dotenv import load_dotenv
 from dropbox import DropboxOAuth2FlowNoRedirect
 import webbrowser
+import threading
 from PySide6.QtWidgets import QInputDialog, QMessageBox
 from config_manager import ConfigManager
+from throttle import shared_budget, PRIORITY_BULK, CHUNK_SIZE
+from profiling import profile_call
+from storage_backend import StorageBackend, RemoteEntry
+from sync_log import sync_log
 
 load_dotenv()
 
+# files above this are uploaded in chunks through an upload session
+UPLOAD_SESSION_THRESHOLD = 8 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# one HTTP connection pool and one client per token for the whole process,
+# so syncing many libraries doesn't open a pool per library
+_session = None
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(token, max_connections=8):
+    """Dropbox client for a token, created once and validated on creation"""
+    global _session
+    with _clients_lock:
+        client = _clients.get(token)
+        if client is None:
+            if _session is None:
+                _session = dropbox.create_session(max_connections=max_connections)
+            client = dropbox.Dropbox(token, session=_session)
+            # Test if token is valid
+            client.users_get_current_account()
+            _clients[token] = client
+        return client
+
 
-class DropboxManager:
+class DropboxManager(StorageBackend):
     APP_KEY = os.getenv("DROPBOX_APP_KEY")
     APP_SECRET = os.getenv("DROPBOX_APP_SECRET")
 
     def __init__(self, config_manager: ConfigManager):
         self.dbx = None
         self.config_manager = config_manager
+        # limits are applied once per run from the top level config, see
+        # SyncOrchestrator and GameSyncApp, not per library
+        self.bandwidth = shared_budget()
 
     def initialize_from_token(self, token=None):
         """
@@ -36,9 +69,8 @@ class DropboxManager:
             return False
 
         try:
-            self.dbx = dropbox.Dropbox(token)
-            # Test if token is valid
-            self.dbx.users_get_current_account()
+            self.dbx = shared_client(
+                token, self.config_manager.config.get("http_max_connections", 8))
             return True
         except AuthError:
             return False
@@ -73,7 +105,9 @@ class DropboxManager:
             self.config_manager.set_config("dropbox_token", oauth_result.access_token)
 
             # Initialize Dropbox client with the token
-            self.dbx = dropbox.Dropbox(oauth_result.access_token)
+            self.dbx = shared_client(
+                oauth_result.access_token,
+                self.config_manager.config.get("http_max_connections", 8))
             return True
         except Exception as e:
             QMessageBox.warning(
@@ -83,6 +117,7 @@ class DropboxManager:
             )
             return False
 
+    @profile_call
     def list_folders(self, path=""):
         """List all contents in the specified folder."""
         try:
@@ -125,37 +160,114 @@ class DropboxManager:
 
         return None
 
-    def download_file(self, dropbox_path, local_path):
-        """Download a file from Dropbox to local path"""
+    @profile_call
+    def download_file(self, dropbox_path, local_path, priority=PRIORITY_BULK):
+        """Download a file from Dropbox to local path, within the download budget"""
         if not self.dbx:
             return False
 
         try:
-            self.dbx.files_download_to_file(local_path, dropbox_path)
+            _, response = self.dbx.files_download(dropbox_path)
+            try:
+                with open(local_path, 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        self.bandwidth.download.consume(len(chunk), priority)
+                        f.write(chunk)
+            finally:
+                response.close()
             return True
         except Exception:
             return False
 
-    def upload_file(self, local_path, dropbox_path):
-        """Upload a file from local path to Dropbox"""
-        print(local_path, dropbox_path)
+    @profile_call
+    def upload_file(self, local_path, dropbox_path, priority=PRIORITY_BULK):
+        """Upload a file from local path to Dropbox, within the upload budget
+
+        Large files (save states) go through an upload session one chunk at a
+        time, so they never sit in memory whole. With an upload limit set every
+        file over a quarter second of budget uses a session too, so no single
+        request goes out as a long burst at full line speed.
+        """
+        sync_log.debug("Uploading %s to %s", local_path, dropbox_path)
         
         if not self.dbx:
             return False
 
         try:
+            size = os.path.getsize(local_path)
+            mode = dropbox.files.WriteMode.overwrite
+            chunk_size = self.bandwidth.upload.request_size(UPLOAD_CHUNK_SIZE)
+            if self.bandwidth.upload.rate:
+                single_limit = chunk_size
+            else:
+                single_limit = UPLOAD_SESSION_THRESHOLD
+
             with open(local_path, 'rb') as f:
-                self.dbx.files_upload(
-                    f.read(),
-                    dropbox_path,
-                    mode=dropbox.files.WriteMode.overwrite
-                )
-            return True
+                if size <= single_limit:
+                    data = f.read()
+                    self._pace_upload(len(data), priority)
+                    self.dbx.files_upload(data, dropbox_path, mode=mode)
+                    return True
+
+                chunk = f.read(chunk_size)
+                self._pace_upload(len(chunk), priority)
+                session = self.dbx.files_upload_session_start(chunk)
+                cursor = dropbox.files.UploadSessionCursor(
+                    session_id=session.session_id, offset=f.tell())
+                commit = dropbox.files.CommitInfo(path=dropbox_path, mode=mode)
+
+                while True:
+                    chunk = f.read(chunk_size)
+                    self._pace_upload(len(chunk), priority)
+                    if not chunk or f.tell() >= size:
+                        self.dbx.files_upload_session_finish(chunk, cursor, commit)
+                        return True
+                    self.dbx.files_upload_session_append_v2(chunk, cursor)
+                    cursor.offset = f.tell()
         except Exception as e:
-            print(f"Error uploading file: {e}")
+            sync_log.error("Error uploading file: %s", e)
             return False
-            
 
+    def _pace_upload(self, size, priority):
+        # pace the request to the budget before handing it to the client
+        for offset in range(0, size, CHUNK_SIZE):
+            self.bandwidth.upload.consume(min(CHUNK_SIZE, size - offset), priority)
+
+    def is_ready(self):
+        return self.dbx is not None
+
+    def _entry(self, metadata):
+        is_folder = isinstance(metadata, dropbox.files.FolderMetadata)
+        return RemoteEntry(
+            name=metadata.name,
+            path=metadata.path_display,
+            modified=None if is_folder else metadata.server_modified,
+            size=0 if is_folder else metadata.size,
+            content_hash=None if is_folder else metadata.content_hash,
+            is_folder=is_folder)
+
+    @profile_call
+    def list_folder(self, path="", cursor=None):
+        """One page of a folder listing as RemoteEntry's, deleted entries are skipped"""
+        if cursor:
+            result = self.dbx.files_list_folder_continue(cursor)
+        else:
+            result = self.dbx.files_list_folder(path)
+
+        entries = [self._entry(entry) for entry in result.entries
+                   if isinstance(entry, (dropbox.files.FileMetadata,
+                                         dropbox.files.FolderMetadata))]
+        return entries, result.cursor, result.has_more
+
+    @profile_call
+    def stat(self, path):
+        metadata = self.get_file_metadata(path)
+        if not isinstance(metadata, (dropbox.files.FileMetadata,
+                                     dropbox.files.FolderMetadata)):
+            return None
+        return self._entry(metadata)
+
+    @profile_call
     def get_file_metadata(self, path):
         """Get metadata for a file including last modified time"""
         if not self.dbx:
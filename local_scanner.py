@@ -0,0 +1,101 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from profiling import profiled
+from sync_log import sync_log
+
+# Earlier extensions win when a game has more than one save file
+DEFAULT_SAVE_EXTENSIONS = [".sav", ".srm", ".dsv", ".sa1", ".fla", ".eep", ".mcr"]
+
+LocalSave = namedtuple("LocalSave", ["stem", "path", "mtime", "size", "rank"])
+
+
+def extension_ranks(extensions):
+    """Map lower-cased extension -> precedence (lower is better)"""
+    ranks = {}
+    for rank, ext in enumerate(extensions or DEFAULT_SAVE_EXTENSIONS):
+        ext = ext.lower()
+        if not ext.startswith("."):
+            ext = "." + ext
+        ranks.setdefault(ext, rank)
+    return ranks
+
+
+def _is_better(candidate, current):
+    # better extension first, then the most recently written file
+    return (candidate.rank, -candidate.mtime) < (current.rank, -current.mtime)
+
+
+def _scan_dir(path, ranks, recursive):
+    """Scan a single directory, stat'ing each matching file exactly once"""
+    found = []
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not entry.name.startswith("."):
+                            subdirs.append(entry.path)
+                        continue
+
+                    stem, ext = os.path.splitext(entry.name)
+                    rank = ranks.get(ext.lower())
+                    if rank is None:
+                        continue
+
+                    st = entry.stat()
+                    found.append(LocalSave(stem, entry.path, st.st_mtime,
+                                           st.st_size, rank))
+                except OSError:
+                    # file vanished or is unreadable, skip it
+                    continue
+    except OSError as e:
+        sync_log.error("Error scanning %s: %s", path, e)
+    return found, subdirs
+
+
+def scan_save_tree(root, extensions=None, recursive=True, workers=4, executor=None):
+    """Find save files under root, keyed by file name without extension
+
+    Per-system subfolders are walked in parallel when `recursive` is set,
+    on `executor` if one is given (it is left running) or a private pool.
+    When the same stem shows up more than once, the extension precedence
+    decides and the newest file breaks ties.
+    """
+    ranks = extension_ranks(extensions)
+    saves = {}
+
+    def merge(found):
+        for save in found:
+            current = saves.get(save.stem)
+            if current is None or _is_better(save, current):
+                saves[save.stem] = save
+
+    if not recursive or (executor is None and workers <= 1):
+        pending = [root]
+        while pending:
+            found, subdirs = _scan_dir(pending.pop(), ranks, recursive)
+            merge(found)
+            pending.extend(subdirs)
+        return saves
+
+    if executor is not None:
+        _walk_parallel(executor, root, ranks, merge)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            _walk_parallel(executor, root, ranks, merge)
+    return saves
+
+
+def _walk_parallel(executor, root, ranks, merge):
+    scan_dir = profiled(_scan_dir)
+    pending = {executor.submit(scan_dir, root, ranks, True)}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            found, subdirs = future.result()
+            merge(found)
+            for subdir in subdirs:
+                pending.add(executor.submit(scan_dir, subdir, ranks, True))
@@ -1,16 +1,19 @@
 from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QLabel, QListWidget
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from data import get_games
 import sys
 import logging
 
-from PySide6.QtWidgets import QFileDialog, QMessageBox, QHBoxLayout, QProgressDialog
+from PySide6.QtWidgets import QFileDialog, QMessageBox, QHBoxLayout, QProgressDialog, QCheckBox, QListWidgetItem
 
 import os
+import time
 
 from config_manager import ConfigManager
 from dropbox_manager import DropboxManager
 from sync_manager import SyncManager
+from sync_log import sync_log
+from throttle import shared_budget
 
 
 
@@ -29,6 +32,8 @@ class GameSyncApp(QMainWindow):
         self.setGeometry(100, 100, 800, 600)
 
         self.config_manager = ConfigManager()
+        sync_log.configure(self.config_manager.config)
+        self.last_log_seq = 0
         self.dropbox_manager = DropboxManager(self.config_manager)
 
         self.dropbox_label = QLabel(
@@ -45,6 +50,12 @@ class GameSyncApp(QMainWindow):
         self.init_ui()
         self.update_sync_button()
 
+        # the log view is filled in batches, never from the sync path itself
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(250)
+        self.log_timer.timeout.connect(self.flush_sync_log)
+        self.log_timer.start()
+
     def init_ui(self):
         """
         Initialize the user interface.
@@ -126,6 +137,18 @@ class GameSyncApp(QMainWindow):
         self.sync_button.setEnabled(False)
         main_layout.addWidget(self.sync_button)
 
+        # Diagnostics toggle, profiles land in the diagnostics folder
+        self.profiling_checkbox = QCheckBox("Capture diagnostics profile")
+        self.profiling_checkbox.setChecked(
+            bool(self.config_manager.config.get("profiling_enabled", False)))
+        self.profiling_checkbox.toggled.connect(self.toggle_profiling)
+        main_layout.addWidget(self.profiling_checkbox)
+
+        # Sync log
+        main_layout.addWidget(QLabel("Sync Log", alignment=Qt.AlignCenter))
+        self.sync_log_view = QListWidget()
+        main_layout.addWidget(self.sync_log_view)
+
         # Set the main layout
         central_widget.setLayout(main_layout)
 
@@ -233,10 +256,20 @@ class GameSyncApp(QMainWindow):
             self.log_message(f"Selected Dropbox folder: {folder_path}")
             self.update_sync_button()
 
+    def toggle_profiling(self, checked):
+        """Turn sync profiling on or off"""
+        self.config_manager.set_config("profiling_enabled", checked)
+        self.log_message(
+            f"Sync profiling {'enabled' if checked else 'disabled'}")
+
     def update_sync_button(self):
         """Update sync button state based on configuration"""
         config = self.config_manager.config
-        if config["delta_db_path"] and config["local_saves_path"] and config["dropbox_token"]:
+        if config.get("storage_backend", "dropbox") == "local":
+            remote_ready = bool(config.get("local_backend_path"))
+        else:
+            remote_ready = bool(config["dropbox_token"])
+        if config["delta_db_path"] and config["local_saves_path"] and remote_ready:
             self.sync_button.setEnabled(True)
         else:
             self.sync_button.setEnabled(False)
@@ -256,20 +289,32 @@ class GameSyncApp(QMainWindow):
         progress.setMinimumDuration(0)
         progress.show()
 
+        # pick up limits changed since the last sync
+        shared_budget(self.config_manager.config)
         sync_manager = SyncManager(
             self.config_manager, self.dropbox_manager)
         
+        last_update = [0.0]
+
         def progress_callback(current, total, message, success):
             if progress.wasCanceled():
                 return
+            # a few repaints a second is plenty, the sync log has every item
+            now = time.monotonic()
+            if now - last_update[0] < 0.1 and current < total:
+                return
+            last_update[0] = now
             percent = int((current / total) * 100) if total > 0 else 0
             progress.setValue(percent)
             progress.setLabelText(message)
-            self.log_message(message, not success)
             
         success, message = sync_manager.run_sync(progress_callback)
         progress.setValue(100)
         progress.hide()
+        self.flush_sync_log()
+
+        if sync_manager.profiler.last_report:
+            message += f"\n\nProfile saved to {sync_manager.profiler.last_report}"
 
         if success:
             QMessageBox.information(self, "Sync Complete", message)
@@ -279,18 +324,36 @@ class GameSyncApp(QMainWindow):
 
     def log_message(self, message, is_error=False):
         """Add a message to the sync log"""
-        pass
-        # timestamp = time.strftime("%H:%M:%S")
-        # prefix = "ERROR: " if is_error else ""
-        # log_entry = f"[{timestamp}] {prefix}{message}"
-
-        # item = QListWidgetItem(log_entry)
-        # if is_error:
-        #     item.setForeground(Qt.red)
-
-        # self.sync_log.addItem(item)
-        # self.sync_log.scrollToBottom()
-        # logger.info(message) if not is_error else logger.error(message)
+        if is_error:
+            sync_log.error(message)
+        else:
+            sync_log.info(message)
+
+    def flush_sync_log(self):
+        """Move new sync events into the log view in one batch"""
+        events = sync_log.since(self.last_log_seq)
+        if not events:
+            return
+        self.last_log_seq = events[-1].seq
+
+        self.sync_log_view.setUpdatesEnabled(False)
+        for event in events:
+            timestamp = time.strftime("%H:%M:%S", time.localtime(event.time))
+            prefix = "ERROR: " if event.level >= logging.ERROR else ""
+            item = QListWidgetItem(f"[{timestamp}] {prefix}{event.message}")
+            if event.level >= logging.ERROR:
+                item.setForeground(Qt.red)
+            self.sync_log_view.addItem(item)
+
+        # keep the view no bigger than the ring buffer behind it
+        while self.sync_log_view.count() > sync_log.events.maxlen:
+            self.sync_log_view.takeItem(0)
+        self.sync_log_view.setUpdatesEnabled(True)
+        self.sync_log_view.scrollToBottom()
+
+    def closeEvent(self, event):
+        sync_log.close()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
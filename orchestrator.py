@@ -0,0 +1,189 @@
+import logging
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config_manager import ConfigManager
+from dropbox_manager import DropboxManager
+from profiling import SyncProfiler, profiled
+from sync_manager import SyncManager
+from sync_log import sync_log
+from throttle import PRIORITY_STATE, shared_budget
+
+logger = logging.getLogger(__name__)
+
+
+class TransferScheduler:
+    """Runs transfers for many libraries on a fixed number of workers
+
+    Each library gets its own queue and the workers take turns between
+    them, so one library's backfill can't starve everyone else.
+    """
+
+    def __init__(self, workers=4):
+        self._queues = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"transfer-{i}", daemon=True)
+            for i in range(max(int(workers), 1))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, profile, fn, *args):
+        # the workers are not the thread that started the profiler
+        fn = profiled(fn)
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is closed")
+            self._queues.setdefault(profile, deque()).append((future, fn, args))
+            self._cond.notify()
+        return future
+
+    def _next(self):
+        """Round robin: take from the first library, then send it to the back"""
+        profile, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        if queue:
+            self._queues.move_to_end(profile)
+        else:
+            del self._queues[profile]
+        return job
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queues and not self._closed:
+                    self._cond.wait()
+                if not self._queues:
+                    return
+                future, fn, args = self._next()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def close(self):
+        """Finish what is queued, then stop the workers"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+class SyncOrchestrator:
+    """Syncs the top level library and every library in profiles from one process
+
+    Libraries share the Dropbox HTTP pool (see dropbox_manager.shared_client),
+    the scan/hash pools (worker_pools.py), the bandwidth budget and one
+    transfer scheduler. At most max_parallel_profiles libraries are scanned
+    at a time, which keeps memory bounded however many there are.
+    """
+
+    def __init__(self, config_manager: ConfigManager):
+        self.config_manager = config_manager
+        config = config_manager.config
+        self.max_parallel = max(int(config.get("max_parallel_profiles", 4)), 1)
+        self.transfer_workers = config.get("transfer_workers", 4)
+        # one budget for the whole process, profiles can't override it
+        shared_budget(config)
+        # cProfile can only record one run at a time, so the whole process
+        # is profiled as one run rather than each library on its own
+        self.profiler = SyncProfiler(config)
+
+    def run_all(self, progress_callback=None):
+        """Sync every library, returns {library name: (success, message)}
+
+        Raises ValueError when there is nothing configured to sync.
+        """
+        profiles = self.config_manager.libraries()
+        if not profiles:
+            raise ValueError(
+                "No library configured: set delta_db_path or add entries to profiles")
+
+        scheduler = TransferScheduler(self.transfer_workers)
+        try:
+            with self.profiler.run("sync-all"), ThreadPoolExecutor(max_workers=self.max_parallel,
+                                    thread_name_prefix="profile") as executor:
+                futures = {
+                    profile.name: executor.submit(
+                        self.sync_profile, profile, scheduler, progress_callback)
+                    for profile in profiles}
+
+            results = {}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Error syncing {name}: {e}")
+                    results[name] = (False, str(e))
+            return results
+        finally:
+            scheduler.close()
+
+    def sync_profile(self, profile, scheduler, progress_callback=None):
+        """Scan one library and push its transfers through the shared scheduler"""
+        dropbox_manager = DropboxManager(profile)
+        config = profile.config
+        if config.get("storage_backend", "dropbox") != "local" and \
+                not dropbox_manager.initialize_from_token():
+            return False, "Could not connect to Dropbox"
+
+        sync_manager = SyncManager(profile, dropbox_manager)
+        error = sync_manager.prepare_sync()
+        if error:
+            return False, error
+
+        if not sync_manager.has_work():
+            return True, "No files needed syncing"
+
+        priority = sync_manager.order_queues()
+        total_operations = sum(len(q) for q in (
+            sync_manager.upload_queue, sync_manager.download_queue,
+            sync_manager.state_upload_queue, sync_manager.state_download_queue))
+        completed = 0
+
+        def wait_for(futures):
+            nonlocal completed
+            for future in futures:
+                done, success, message = future.result()
+                completed += done
+                if progress_callback:
+                    progress_callback(profile.name, completed, total_operations,
+                                      message, success)
+
+        wait_for([
+            scheduler.submit(profile.name, transfer, item, priority)
+            for transfer, item in sync_manager.save_transfers()])
+
+        # save states are only submitted once this library's battery saves
+        # are done, otherwise idle workers would pick them up alongside
+        wait_for([
+            scheduler.submit(profile.name, transfer, item, PRIORITY_STATE)
+            for transfer, item in sync_manager.state_transfers()])
+
+        return True, f"Completed {completed} sync operations"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    config_path = sys.argv[1] if len(sys.argv) > 1 else "config.json"
+
+    config_manager = ConfigManager(config_path)
+    sync_log.configure(config_manager.config)
+    orchestrator = SyncOrchestrator(config_manager)
+    try:
+        results = orchestrator.run_all()
+    except ValueError as e:
+        logger.error(f"{e} in {config_path}")
+        sys.exit(1)
+    finally:
+        sync_log.close()
+    for name, (success, message) in results.items():
+        logger.info(f"{name}: {'ok' if success else 'failed'} - {message}")
@@ -0,0 +1,182 @@
+import cProfile
+import datetime
+import functools
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# set to 1/true to profile regardless of what the config says (0/false forces it off)
+PROFILE_ENV_VAR = "DELTA_SYNC_PROFILE"
+
+# the profiler currently recording, cProfile can only run one at a time
+_active = None
+# see profiled()
+THREADS_NEED_PROFILING = sys.version_info < (3, 12)
+_active_lock = threading.Lock()
+
+
+def profiling_enabled(config):
+    """Env var wins over the config key so users can flip it without the GUI"""
+    env = os.getenv(PROFILE_ENV_VAR, "").strip().lower()
+    if env:
+        return env not in ("0", "false", "no", "off")
+    return bool(config.get("profiling_enabled", False))
+
+
+def profile_call(func):
+    """Record wall time of a call in the active profile's summary"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active
+        if profiler is None:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.record_call(func.__qualname__, time.perf_counter() - start)
+    return wrapper
+
+
+def profiled(fn):
+    """Wrap fn so it is profiled on whatever thread ends up running it
+
+    Before Python 3.12 cProfile only sees the thread that enabled it, so work
+    handed to pools and the transfer scheduler is wrapped at submit time and
+    its stats are merged into the run that submitted it. From 3.12 on cProfile
+    is built on sys.monitoring and already records every thread. Returns fn
+    as-is then, and whenever no run is being profiled.
+    """
+    profiler = _active
+    if profiler is None or not THREADS_NEED_PROFILING:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        thread_profile = cProfile.Profile()
+        thread_profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            thread_profile.disable()
+            profiler.add_thread_profile(thread_profile)
+    return wrapper
+
+
+class SyncProfiler:
+    """Opt-in cProfile + tracemalloc capture around a sync run.
+
+    Every run writes a .prof file (open with pstats/snakeviz) and a plain
+    text summary of the top functions, allocations and Dropbox calls into
+    the diagnostics folder.
+    """
+
+    def __init__(self, config):
+        self.enabled = profiling_enabled(config)
+        self.output_dir = config.get("diagnostics_path") or "diagnostics"
+        self.top_n = config.get("profiling_top_n", 25)
+        self.call_times = {}
+        self.last_report = None
+        self._calls_lock = threading.Lock()
+        self._thread_profiles = []
+
+    def record_call(self, name, elapsed):
+        with self._calls_lock:
+            count, total, worst = self.call_times.get(name, (0, 0.0, 0.0))
+            self.call_times[name] = (count + 1, total + elapsed, max(worst, elapsed))
+
+    def add_thread_profile(self, thread_profile):
+        with self._calls_lock:
+            if _active is self:
+                self._thread_profiles.append(thread_profile)
+
+    @contextmanager
+    def run(self, label="sync"):
+        """Profile the body of the with block if profiling is switched on"""
+        global _active
+
+        with _active_lock:
+            if not self.enabled or _active is not None:
+                profiler = None
+            else:
+                profiler = cProfile.Profile()
+                _active = self
+
+        if profiler is None:
+            yield
+            return
+
+        self.call_times = {}
+        self._thread_profiles = []
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            with _active_lock, self._calls_lock:
+                _active = None
+                thread_profiles, self._thread_profiles = self._thread_profiles, []
+
+            try:
+                self.last_report = self._write_report(
+                    label, profiler, thread_profiles, snapshot, peak, elapsed)
+            except Exception as e:
+                logger.error(f"Error writing profile: {e}")
+
+    def _write_report(self, label, profiler, thread_profiles, snapshot, peak, elapsed):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(self.output_dir, f"{label}-{stamp}")
+
+        out = io.StringIO()
+        # the calling thread plus everything profiled() ran on worker threads
+        stats = pstats.Stats(profiler, stream=out)
+        for thread_profile in thread_profiles:
+            stats.add(thread_profile)
+        stats.dump_stats(base + ".prof")
+
+        out.write(f"{label} took {elapsed:.3f}s, peak traced memory "
+                  f"{peak / 1024:.1f} KiB\n\n")
+
+        out.write("== Dropbox calls (count, total s, slowest s) ==\n")
+        for name, (count, total, worst) in sorted(
+                self.call_times.items(), key=lambda kv: kv[1][1], reverse=True):
+            out.write(f"{name}: {count}, {total:.3f}, {worst:.3f}\n")
+
+        out.write(f"\n== Top functions by cumulative time "
+                  f"({len(thread_profiles)} worker tasks merged) ==\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+
+        out.write("\n== Top allocations ==\n")
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        for stat in snapshot.statistics("lineno")[:self.top_n]:
+            out.write(f"{stat}\n")
+
+        with open(base + ".txt", "w") as f:
+            f.write(out.getvalue())
+
+        logger.info(f"Wrote sync profile to {base}.prof")
+        return base + ".prof"
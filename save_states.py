@@ -0,0 +1,94 @@
+import datetime
+import os
+import sqlite3
+
+# Delta stores each save state as two files, the state itself and a thumbnail.
+# Remotely they are SaveState-<identifier>-<file id>, locally we keep them as
+# <save states folder>/<identifier><suffix>.
+STATE_FILES = {
+    "saveState": ".svs",
+    "thumbnail": ".png",
+}
+
+REMOTE_PREFIX = "SaveState-"
+
+COCOA_EPOCH = datetime.datetime(2001, 1, 1)
+
+
+def _new_file():
+    return {
+        'local_path': None,
+        'local_modified': None,
+        'local_size': None,
+        'dropbox_path': None,
+        'dropbox_modified': None,
+        'dropbox_size': None,
+        'dropbox_hash': None
+    }
+
+
+def load_save_states(cursor, since=0, selected=None):
+    """Read ZSAVESTATE rows into {identifier: info}, empty if the table is missing
+
+    Rows come back most recently modified first. `since` skips states older
+    than a Cocoa timestamp and `selected(name, game identifier)` filters games.
+    """
+    try:
+        cursor.execute("""
+                       SELECT s.ZIDENTIFIER, s.ZMODIFIEDDATE, g.ZNAME, g.ZIDENTIFIER
+                       FROM zsavestate s
+                       JOIN zgame g ON s.ZGAME = g.Z_PK
+                       WHERE s.ZMODIFIEDDATE >= ?
+                       ORDER BY s.ZMODIFIEDDATE DESC
+                       """, (since,))
+    except sqlite3.OperationalError:
+        # older databases have no save states
+        return {}
+
+    states = {}
+    for identifier, modified_date, name, game_identifier in cursor.fetchall():
+        if not (identifier and modified_date and name):
+            continue
+        if selected and not selected(name, game_identifier):
+            continue
+        states[identifier] = {
+            'name': name,
+            'game_identifier': game_identifier,
+            'timestamp': COCOA_EPOCH + datetime.timedelta(seconds=modified_date),
+            'files': {file_id: _new_file() for file_id in STATE_FILES}
+        }
+    return states
+
+
+def parse_remote_name(filename):
+    """SaveState-<identifier>-<file id> -> (identifier, file id), or (None, None)"""
+    if not filename.startswith(REMOTE_PREFIX):
+        return None, None
+    for file_id in STATE_FILES:
+        suffix = "-" + file_id
+        if filename.endswith(suffix):
+            return filename[len(REMOTE_PREFIX):-len(suffix)], file_id
+    return None, None
+
+
+def remote_name(identifier, file_id):
+    return f"{REMOTE_PREFIX}{identifier}-{file_id}"
+
+
+def scan_local_states(folder):
+    """Yield (identifier, file id, path, stat) for state files in folder"""
+    suffixes = {suffix: file_id for file_id, suffix in STATE_FILES.items()}
+    if not os.path.isdir(folder):
+        return
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            file_id = suffixes.get(ext.lower())
+            if not file_id:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                yield stem, file_id, entry.path, entry.stat()
+            except OSError:
+                continue
@@ -0,0 +1,159 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SnapshotStore:
+    """Content-addressed copies of saves taken before they get overwritten.
+
+    Objects live under objects/<first two hex chars>/<sha1>, so identical
+    saves (across games or runs) are stored once. index.json records which
+    game each version belonged to and when it was captured; entries past the
+    age limit are dropped and the oldest ones are evicted when the store
+    grows past its size limit.
+    """
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024, max_age_days=30):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.json")
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self.entries = self._load_index()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.get("snapshot_path") or "snapshots",
+            max_bytes=config.get("snapshot_max_bytes", 256 * 1024 * 1024),
+            max_age_days=config.get("snapshot_max_age_days", 30))
+
+    @classmethod
+    def for_save_states(cls, config):
+        """A store of its own, so multi-MB save states can't evict battery save history"""
+        return cls(
+            os.path.join(config.get("snapshot_path") or "snapshots", "states"),
+            max_bytes=config.get("state_snapshot_max_bytes", 256 * 1024 * 1024),
+            max_age_days=config.get("snapshot_max_age_days", 30))
+
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading snapshot index: {e}")
+        return []
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=4)
+        os.replace(tmp_path, self.index_path)
+
+    def object_path(self, sha1):
+        return os.path.join(self.objects_dir, sha1[:2], sha1)
+
+    def capture(self, path, identifier, source="local", original_path=None):
+        """Copy a file into the store, returns its sha1 (None if there was nothing to copy)
+
+        original_path is what history shows when path is only a staging copy,
+        e.g. the Dropbox path of a version downloaded to a temp file.
+        """
+        if not path or not os.path.isfile(path):
+            return None
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        hasher = hashlib.sha1()
+        size = 0
+
+        # hash while copying so the file is only read once
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as out, open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+
+            sha1 = hasher.hexdigest()
+            with self._lock:
+                target = self.object_path(sha1)
+                if os.path.exists(target):
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(tmp_path, target)
+
+                self.entries.append({
+                    'identifier': identifier,
+                    'sha1': sha1,
+                    'size': size,
+                    'path': original_path or path,
+                    'source': source,
+                    'captured': datetime.datetime.now().isoformat()
+                })
+                self._evict()
+                self._save_index()
+            return sha1
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def history(self, identifier):
+        """Snapshots of a game, newest first"""
+        with self._lock:
+            entries = [e for e in self.entries if e['identifier'] == identifier]
+        return list(reversed(entries))
+
+    def restore(self, sha1, dest_path):
+        """Put a stored version back in place without touching Dropbox"""
+        source = self.object_path(sha1)
+        if not os.path.exists(source):
+            return False
+
+        tmp_path = dest_path + ".tmp"
+        with open(source, 'rb') as f, open(tmp_path, 'wb') as out:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                out.write(chunk)
+        os.replace(tmp_path, dest_path)
+        return True
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones until we fit. Caller holds the lock."""
+        kept = list(self.entries)
+        if self.max_age_days:
+            cutoff = (datetime.datetime.now() -
+                      datetime.timedelta(days=self.max_age_days)).isoformat()
+            kept = [e for e in kept if e['captured'] >= cutoff]
+
+        # identical versions share one object, so count each sha1 once
+        sizes = {}
+        for e in kept:
+            sizes[e['sha1']] = e['size']
+        total = sum(sizes.values())
+
+        # never evict the version we just captured
+        while self.max_bytes and len(kept) > 1 and total > self.max_bytes:
+            oldest = kept.pop(0)
+            if not any(e['sha1'] == oldest['sha1'] for e in kept):
+                total -= oldest['size']
+
+        referenced = {e['sha1'] for e in kept}
+        for e in self.entries:
+            if e['sha1'] not in referenced:
+                try:
+                    os.remove(self.object_path(e['sha1']))
+                except OSError:
+                    pass
+        self.entries = kept
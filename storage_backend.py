@@ -0,0 +1,157 @@
+import datetime
+import hashlib
+import itertools
+import os
+import shutil
+from collections import namedtuple
+
+from throttle import PRIORITY_BULK
+from sync_log import sync_log
+
+# modified is a naive UTC datetime, the same as Dropbox's server_modified
+RemoteEntry = namedtuple(
+    "RemoteEntry", ["name", "path", "modified", "size", "content_hash", "is_folder"])
+
+# Dropbox hashes files in 4 MiB blocks, see
+# https://www.dropbox.com/developers/reference/content-hash
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def dropbox_content_hash(file_path):
+    """Dropbox-style content hash of a local file, comparable across backends"""
+    block_hashes = b""
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            block_hashes += hashlib.sha256(block).digest()
+    return hashlib.sha256(block_hashes).hexdigest()
+
+
+class StorageBackend:
+    """Where the remote copy of the saves lives.
+
+    Paths are "/"-separated and rooted at the backend, like Dropbox paths.
+    """
+
+    def list_folder(self, path="", cursor=None):
+        """Return (entries, cursor, has_more). Pass the cursor back to continue."""
+        raise NotImplementedError
+
+    def stat(self, path):
+        """RemoteEntry for a path, None if it doesn't exist"""
+        raise NotImplementedError
+
+    def upload_file(self, local_path, remote_path, priority=PRIORITY_BULK):
+        raise NotImplementedError
+
+    def download_file(self, remote_path, local_path, priority=PRIORITY_BULK):
+        raise NotImplementedError
+
+    def content_hash(self, path):
+        """Dropbox-style content hash of a remote file"""
+        entry = self.stat(path)
+        return entry.content_hash if entry else None
+
+    def is_ready(self):
+        return True
+
+    def iter_folder(self, path=""):
+        """Every entry in a folder, following cursors"""
+        entries, cursor, has_more = self.list_folder(path)
+        yield from entries
+        while has_more:
+            entries, cursor, has_more = self.list_folder(path, cursor)
+            yield from entries
+
+
+class LocalFolderBackend(StorageBackend):
+    """Backend for a local or mounted directory (e.g. a NAS share)"""
+
+    def __init__(self, root, page_size=1000):
+        self.root = root
+        self.page_size = page_size
+        self._listings = {}
+        self._tokens = itertools.count(1)
+
+    def _local(self, path):
+        return os.path.join(self.root, *[p for p in path.split("/") if p])
+
+    def _entry(self, path, st, is_folder, with_hash=True):
+        modified = datetime.datetime.fromtimestamp(
+            st.st_mtime, tz=datetime.timezone.utc).replace(tzinfo=None)
+        return RemoteEntry(
+            name=path.rstrip("/").rsplit("/", 1)[-1],
+            path=path,
+            modified=modified,
+            size=0 if is_folder else st.st_size,
+            content_hash=dropbox_content_hash(self._local(path))
+            if with_hash and not is_folder else None,
+            is_folder=is_folder)
+
+    def is_ready(self):
+        return bool(self.root) and os.path.isdir(self.root)
+
+    def list_folder(self, path="", cursor=None):
+        # the first call snapshots the sorted listing, cursors page through it
+        if cursor:
+            token, offset = cursor.rsplit(":", 1)
+            listing = self._listings[token]
+            offset = int(offset)
+        else:
+            listing = self._snapshot(path)
+            token = str(next(self._tokens))
+            self._listings[token] = listing
+            offset = 0
+
+        next_offset = offset + self.page_size
+        has_more = next_offset < len(listing)
+        if not has_more:
+            self._listings.pop(token, None)
+        return listing[offset:next_offset], f"{token}:{next_offset}", has_more
+
+    def _snapshot(self, path):
+        listing = []
+        with os.scandir(self._local(path)) as entries:
+            for entry in entries:
+                try:
+                    is_folder = entry.is_dir()
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entry_path = f"{path.rstrip('/')}/{entry.name}"
+                # hashing every file here would make listing cost a full read
+                listing.append(self._entry(entry_path, st, is_folder, with_hash=False))
+        listing.sort(key=lambda e: e.name)
+        return listing
+
+    def stat(self, path):
+        try:
+            st = os.stat(self._local(path))
+        except OSError:
+            return None
+        return self._entry(path, st, os.path.isdir(self._local(path)))
+
+    def upload_file(self, local_path, remote_path, priority=PRIORITY_BULK):
+        return self._copy(local_path, self._local(remote_path))
+
+    def download_file(self, remote_path, local_path, priority=PRIORITY_BULK):
+        return self._copy(self._local(remote_path), local_path)
+
+    def _copy(self, source, dest):
+        tmp_path = dest + ".part"
+        try:
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, dest)
+            return True
+        except Exception as e:
+            sync_log.error("Error copying %s to %s: %s", source, dest, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+
+def create_backend(config, dropbox_manager):
+    """Pick the backend named by the storage_backend config key"""
+    if config.get("storage_backend", "dropbox") == "local":
+        return LocalFolderBackend(config.get("local_backend_path", ""))
+    return dropbox_manager
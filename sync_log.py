@@ -0,0 +1,112 @@
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+SyncEvent = namedtuple("SyncEvent", ["seq", "time", "level", "message"])
+
+
+class SyncEventLog:
+    """Structured log of what a sync did, cheap enough for per-file events
+
+    Events below the configured level are dropped with a single comparison,
+    before any %-style args are formatted.
+    The rest go into a bounded ring buffer that the UI polls with since()
+    and, if a log file is configured, onto a queue that a background
+    thread writes to a rotating file, so nothing on the sync path waits
+    for disk or the UI.
+    """
+
+    def __init__(self, capacity=5000, level=logging.INFO):
+        self.level = level
+        self.events = deque(maxlen=capacity)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._file_queue = None
+        self._listener = None
+
+    def configure(self, config):
+        """Apply log_level, log_buffer_size and log_file settings"""
+        level = logging.getLevelName(str(config.get("log_level", "INFO")).upper())
+        self.level = level if isinstance(level, int) else logging.INFO
+
+        capacity = config.get("log_buffer_size", 5000)
+        with self._lock:
+            if capacity != self.events.maxlen:
+                self.events = deque(self.events, maxlen=capacity)
+
+        self.close()
+        log_file = config.get("log_file")
+        if log_file:
+            os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=config.get("log_max_bytes", 1024 * 1024),
+                backupCount=config.get("log_backup_count", 3))
+            handler.setFormatter(logging.Formatter(
+                "%(asctime)s %(levelname)s %(message)s"))
+            self._file_queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(
+                self._file_queue, handler)
+            self._listener.start()
+
+    def close(self):
+        """Flush and stop the file writer"""
+        if self._listener:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+        self._listener = None
+        self._file_queue = None
+
+    def log(self, level, message, *args):
+        """Record an event, args are %-formatted into message only if it is kept"""
+        if level < self.level:
+            return
+        if args:
+            message = message % args
+
+        with self._lock:
+            # numbered under the lock so seq order matches buffer order for since()
+            event = SyncEvent(next(self._seq), time.time(), level, message)
+            self.events.append(event)
+
+        file_queue = self._file_queue
+        if file_queue is not None:
+            file_queue.put(logging.makeLogRecord({
+                "msg": message,
+                "levelno": level,
+                "levelname": logging.getLevelName(level),
+                "created": event.time,
+            }))
+
+    def debug(self, message, *args):
+        self.log(logging.DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(logging.INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(logging.WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(logging.ERROR, message, *args)
+
+    def since(self, seq=0):
+        """Events newer than seq that are still in the buffer, oldest first"""
+        with self._lock:
+            newer = []
+            for event in reversed(self.events):
+                if event.seq <= seq:
+                    break
+                newer.append(event)
+        newer.reverse()
+        return newer
+
+
+# shared by the sync engine and the UI
+sync_log = SyncEventLog()
@@ -1,8 +1,21 @@
 from config_manager import ConfigManager
 from dropbox_manager import DropboxManager
+from throttle import priority_for, PRIORITY_STATE
+from profiling import SyncProfiler, profiled
+from local_scanner import scan_save_tree
+from snapshot_store import SnapshotStore
+from storage_backend import create_backend, dropbox_content_hash
+from worker_pools import shared_pool
+import save_states
+from sync_log import sync_log
 import sqlite3
 import datetime
 import os
+import queue
+import fnmatch
+import threading
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import json
 from tzlocal import get_localzone
@@ -21,6 +34,11 @@ class SyncManager():
         self.local_path = self.config_manager.config["local_saves_path"]
         self.dropbox_path = self.config_manager.config["dropbox_folder_path"]
         self.delta_db_path = self.config_manager.config["delta_db_path"]
+        self.profiler = SyncProfiler(self.config_manager.config)
+        self.snapshots = SnapshotStore.from_config(self.config_manager.config)
+        self.state_snapshots = SnapshotStore.for_save_states(self.config_manager.config)
+        # Dropbox by default, or a local/NAS folder
+        self.backend = create_backend(self.config_manager.config, dropbox_manager)
 
         # USE A HASHMAP game/id map
         self.game_map = {}
@@ -28,9 +46,14 @@ class SyncManager():
         # game saves
         self.sav_map = {}
 
+        # save states, kept apart from battery saves since they're big
+        self.state_map = {}
+
         # sync queues
         self.upload_queue = []
         self.download_queue = []
+        self.state_upload_queue = []
+        self.state_download_queue = []
 
     def load_game_data(self):
         """Load from Delta's SQL Database
@@ -45,14 +68,20 @@ class SyncManager():
                 self.game_map[name] = identifier
                 self.game_map[identifier] = name
 
-            # then get save information
+            # then get save information, most recently played first so
+            # those games are planned and transferred ahead of dormant ones
+            since = self.recent_cutoff()
             cursor.execute("""
-                           SELECT gs.ZIDENTIFIER, ZMODIFIEDDATE, g.ZNAME
+                           SELECT gs.ZIDENTIFIER, ZMODIFIEDDATE, g.ZNAME, g.ZIDENTIFIER
                            FROM zgamesave gs
                            JOIN zgame g ON gs.ZGAME = g.Z_PK
-                           """)
+                           WHERE ZMODIFIEDDATE >= ?
+                           ORDER BY ZMODIFIEDDATE DESC
+                           """, (since,))
 
-            for identifier, modified_date, name in cursor.fetchall():
+            for identifier, modified_date, name, game_identifier in cursor.fetchall():
+                if not self.game_selected(name, game_identifier):
+                    continue
                 if identifier and modified_date and name:
                     cocoa_epoch = datetime.datetime(2001, 1, 1)
                     timestamp = cocoa_epoch + \
@@ -62,237 +91,666 @@ class SyncManager():
                         'name': name,
                         'timestamp': timestamp,
                         'local_modified': None,
+                        'local_size': None,
                         'local_path': None,
                         'local_header_path': None,
                         'dropbox_path': None,
                         'dropbox_filename': None,
                         'dropbox_modified': None,
+                        'dropbox_hash': None,
                         'dropbox_header_path': None,
                         'dropbox_header_filename': None,
                         'dropbox_header_modified': None
                     }
 
+            if self.config_manager.config.get("sync_save_states", True):
+                self.state_map = save_states.load_save_states(
+                    cursor, since=since, selected=self.game_selected)
+
             conn.close()
             return True
         except Exception as e:
-            print(e)
+            sync_log.error("Error loading game data: %s", e)
+            return False
+
+    def recent_cutoff(self):
+        """Oldest ZMODIFIEDDATE (Cocoa seconds) to sync, recent_days=0 means everything"""
+        days = self.config_manager.config.get("recent_days", 0)
+        if not days:
+            return 0
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        cutoff = now - datetime.timedelta(days=days)
+        return (cutoff - datetime.datetime(2001, 1, 1)).total_seconds()
+
+    def game_selected(self, name, identifier):
+        """Apply the include_games/exclude_games rules (names, identifiers or glob patterns)"""
+        config = self.config_manager.config
+
+        candidates = [(name or "").lower(), (identifier or "").lower()]
+
+        def matches(patterns):
+            for pattern in patterns:
+                pattern = pattern.lower()
+                # exact names first, "Pokemon Emerald [Hack]" is not a glob
+                if pattern in candidates or any(
+                        fnmatch.fnmatchcase(c, pattern) for c in candidates):
+                    return True
             return False
 
+        include = config.get("include_games") or []
+        if include and not matches(include):
+            return False
+        return not matches(config.get("exclude_games") or [])
+
     def scan_local_saves(self):
-        """scans local save folder to find existing saves
+        """scans local save folder (and per-system subfolders) to find existing saves
         """
         try:
-            local_files = os.listdir(self.local_path)
-            for file in local_files:
-                parts = file.split(".")
-                if parts[0] in self.game_map:
-                    full_path = os.path.join(self.local_path, file)
-                    modified_time = datetime.datetime.fromtimestamp(
-                        os.path.getmtime(full_path))
-
-                    self.sav_map[self.game_map[parts[0]]
-                                 ]['local_path'] = full_path
-                    self.sav_map[self.game_map[parts[0]]
-                                 ]['local_modified'] = modified_time
+            self.apply_local_saves(self.walk_local_saves())
+            self.scan_local_states()
             return True
 
         except Exception as e:
-            print(e)
+            sync_log.error("Error scanning local saves: %s", e)
             return False
 
-    def scan_dropbox_saves(self):
-        """Scan Dropbox folder to find existing save files"""
-        try:
-            # Get list of files in the Dropbox Delta folder
-            result = self.dropbox_manager.dbx.files_list_folder(
-                self.dropbox_path)
-
-            for entry in result.entries:
-                if hasattr(entry, 'name') and not hasattr(entry, 'folder'):  # It's a file
-                    filename = entry.name
-                    identifier = None
-                    file_type = None
-
-                    # Handle different file naming patterns
-                    if filename.startswith("gamesave-"):
-                        # Format: gamesave-IDENTIFIER
-                        print("this is a game header " + filename)
-                        identifier = filename.replace("gamesave-", "", 1)
-                        file_type = "header"
-                    elif filename.startswith("GameSave-") and filename.endswith("-gameSave"):
-                        # Format: GameSave-IDENTIFIER-gameSave
-                        print("this is a game save " + filename)
-                        middle_part = filename.replace(
-                            "GameSave-", "", 1).replace("-gameSave", "", 1)
-                        identifier = middle_part
-                        file_type = "save"
-
-                    if identifier and identifier in self.sav_map and file_type == "save":
-                        dropbox_path = f"{self.dropbox_path}/{filename}"
-
-                        # Get metadata for modified time
-                        metadata = self.dropbox_manager.get_file_metadata(
-                            dropbox_path)
-                        if metadata and hasattr(metadata, 'server_modified'):
-                            self.sav_map[identifier]['dropbox_path'] = dropbox_path
-                            self.sav_map[identifier]['dropbox_modified'] = metadata.server_modified
-                            self.sav_map[identifier]['dropbox_filename'] = filename
-                    elif identifier and identifier in self.sav_map and file_type == "header":
-                        dropbox_path = f"{self.dropbox_path}/{filename}"
-
-                        # Get metadata for modified time
-                        metadata = self.dropbox_manager.get_file_metadata(
-                            dropbox_path)
-                        if metadata and hasattr(metadata, 'server_modified'):
-                            self.sav_map[identifier]['dropbox_header_path'] = dropbox_path
-                            self.sav_map[identifier]['dropbox_header_modified'] = metadata.server_modified
-                            self.sav_map[identifier]['dropbox_header_filename'] = filename
-                        # we also need to generate the actual header file 
+    def walk_local_saves(self):
+        """Walk the local save tree, doesn't need the database yet"""
+        config = self.config_manager.config
+        return scan_save_tree(
+            self.local_path,
+            extensions=config.get("save_extensions"),
+            recursive=config.get("scan_subfolders", True),
+            executor=shared_pool("scan", config.get("scan_workers", 4)))
+
+    def apply_local_saves(self, saves):
+        """Match walked save files to games in sav_map"""
+        for stem, save in saves.items():
+            identifier = self.resolve_identifier(stem)
+            if not identifier:
+                continue
 
+            info = self.sav_map[identifier]
+            # the same game can be saved under its name and its identifier
+            if info['local_modified'] and \
+                    info['local_modified'].timestamp() >= save.mtime:
+                continue
+
+            info['local_path'] = save.path
+            info['local_modified'] = datetime.datetime.fromtimestamp(
+                save.mtime)
+            info['local_size'] = save.size
+
+    def scan_local_states(self):
+        """Find local save state files for the states in state_map"""
+        if not self.state_map:
+            return
+        folder = os.path.join(
+            self.local_path,
+            self.config_manager.config.get("save_states_folder", "Save States"))
+        for identifier, file_id, path, st in save_states.scan_local_states(folder):
+            state = self.state_map.get(identifier)
+            if not state:
+                continue
+            f = state['files'][file_id]
+            f['local_path'] = path
+            f['local_modified'] = datetime.datetime.fromtimestamp(st.st_mtime)
+            f['local_size'] = st.st_size
+
+    def resolve_identifier(self, stem):
+        """Files may be named after the game or its identifier, return the identifier"""
+        if stem in self.sav_map:
+            return stem
+        identifier = self.game_map.get(stem)
+        if identifier in self.sav_map:
+            return identifier
+        return None
 
+    def scan_dropbox_saves(self):
+        """Scan the remote folder to find existing save files"""
+        try:
+            # the listing already carries modified times, no per-file metadata calls
+            for entry in self.backend.iter_folder(self.dropbox_path):
+                self.apply_remote_entry(entry)
             return True
         except Exception as e:
-            print(f"Error scanning Dropbox saves: {e}")
+            sync_log.error("Error scanning Dropbox saves: %s", e)
             return False
 
+    def apply_remote_entry(self, entry):
+        """Record a remote save or header in sav_map, returns its identifier"""
+        if entry.is_folder:
+            return None
+
+        filename = entry.name
+
+        state_identifier, file_id = save_states.parse_remote_name(filename)
+        if state_identifier:
+            state = self.state_map.get(state_identifier)
+            if state:
+                f = state['files'][file_id]
+                f['dropbox_path'] = f"{self.dropbox_path}/{filename}"
+                f['dropbox_modified'] = entry.modified
+                f['dropbox_size'] = entry.size
+                f['dropbox_hash'] = entry.content_hash
+            return None
+
+        identifier = None
+        file_type = None
+
+        # Handle different file naming patterns
+        if filename.startswith("gamesave-"):
+            # Format: gamesave-IDENTIFIER
+            sync_log.debug("this is a game header %s", filename)
+            identifier = filename.replace("gamesave-", "", 1)
+            file_type = "header"
+        elif filename.startswith("GameSave-") and filename.endswith("-gameSave"):
+            # Format: GameSave-IDENTIFIER-gameSave
+            sync_log.debug("this is a game save %s", filename)
+            middle_part = filename.replace(
+                "GameSave-", "", 1).replace("-gameSave", "", 1)
+            identifier = middle_part
+            file_type = "save"
+
+        if not identifier or identifier not in self.sav_map:
+            return None
+
+        dropbox_path = f"{self.dropbox_path}/{filename}"
+        if file_type == "save":
+            self.sav_map[identifier]['dropbox_path'] = dropbox_path
+            self.sav_map[identifier]['dropbox_modified'] = entry.modified
+            self.sav_map[identifier]['dropbox_filename'] = filename
+            self.sav_map[identifier]['dropbox_hash'] = entry.content_hash
+        elif file_type == "header":
+            self.sav_map[identifier]['dropbox_header_path'] = dropbox_path
+            self.sav_map[identifier]['dropbox_header_modified'] = entry.modified
+            self.sav_map[identifier]['dropbox_header_filename'] = filename
+            # we also need to generate the actual header file 
+        return identifier
+
     def compare_and_queue(self):
         """Compare timestamps and queue files for sync"""
         for identifier, info in self.sav_map.items():
-            # Skip if the game doesn't exist in both places
-            if not info.get('local_path') or not info.get('dropbox_path'):
-                continue
-
-            local_time = info.get('local_modified')
-            dropbox_time = info.get('dropbox_modified')
-            
-            if dropbox_time.tzinfo is None:
-                dropbox_time = dropbox_time.replace(tzinfo=pytz.UTC)
+            self.plan_sync(identifier, info)
+
+    def plan_sync(self, identifier, info):
+        """Queue a single game for upload or download if the two sides differ"""
+        # Skip if the game doesn't exist in both places
+        if not info.get('local_path') or not info.get('dropbox_path'):
+            return
+
+        local_time, dropbox_time = self.comparable_times(
+            info.get('local_modified'), info.get('dropbox_modified'))
+        
+        if local_time and dropbox_time:
+            # Add a small buffer (e.g., 1 minute) to avoid syncing identical files
+            time_diff = abs((local_time - dropbox_time).total_seconds())
+            if time_diff < 30:  # Less than a minute difference
+                return
+
+            # same content on both sides, only the timestamps moved
+            if self.same_content(info):
+                return
+
+            if local_time > dropbox_time:
+                sync_log.info("Queued upload of %s", info['name'])
+                # Local is newer, upload to Dropbox
+                self.create_metadata_file(self.sav_map[identifier]['local_path'], info['dropbox_header_path'], identifier)
+                revised_metadata_path = info['dropbox_header_path'].split("/")[2] 
+                self.upload_queue.append({
+                    'identifier': identifier,
+                    'name': info['name'],
+                    'played': info['timestamp'],
+                    'local_path': info['local_path'],
+                    'dropbox_path': info['dropbox_path'],
+                    'local_header_path': info['local_header_path'],
+                    'dropbox_header_path': revised_metadata_path
+                })
             else:
-                # If it already has a timezone, ensure it's UTC
-                dropbox_time = dropbox_time.astimezone(pytz.UTC)
-            
-            # Get the local timezone of the device
-            local_timezone = get_localzone()
-            if local_time.tzinfo is None:
-                local_time = local_time.replace(tzinfo=local_timezone)
-            else:
-                # If it already has a timezone, convert it to the local timezone
-                local_time = local_time.astimezone(local_timezone)
-            
-            if local_time and dropbox_time:
-                # Add a small buffer (e.g., 1 minute) to avoid syncing identical files
-                time_diff = abs((local_time - dropbox_time).total_seconds())
-                if time_diff < 30:  # Less than a minute difference
+                # Dropbox is newer, download to local
+
+                sync_log.info("Queued download of %s", info['name'])
+                self.download_queue.append({
+                    'identifier': identifier,
+                    'name': info['name'],
+                    'played': info['timestamp'],
+                    'local_path': info['local_path'],
+                    'dropbox_path': info['dropbox_path']
+                })
+
+    def comparable_times(self, local_time, dropbox_time):
+        """Make a local and a Dropbox timestamp timezone aware so they can be compared"""
+        if dropbox_time.tzinfo is None:
+            dropbox_time = dropbox_time.replace(tzinfo=pytz.UTC)
+        else:
+            # If it already has a timezone, ensure it's UTC
+            dropbox_time = dropbox_time.astimezone(pytz.UTC)
+        
+        # Get the local timezone of the device
+        local_timezone = get_localzone()
+        if local_time.tzinfo is None:
+            local_time = local_time.replace(tzinfo=local_timezone)
+        else:
+            # If it already has a timezone, convert it to the local timezone
+            local_time = local_time.astimezone(local_timezone)
+        return local_time, dropbox_time
+
+    def plan_save_states(self):
+        """Queue save state files whose content differs, newest side wins
+
+        Unlike battery saves, a state that only exists on one side is copied
+        to the other, under Delta's remote name or in the local states folder.
+        """
+        for identifier, state in self.state_map.items():
+            for file_id, f in state['files'].items():
+                if not f['local_path'] and not f['dropbox_path']:
+                    continue
+
+                item = {
+                    'identifier': identifier,
+                    'file_id': file_id,
+                    'name': f"{state['name']} save state ({file_id})",
+                    'local_path': f['local_path'] or
+                    self.state_local_path(identifier, file_id),
+                    'dropbox_path': f['dropbox_path'] or
+                    f"{self.dropbox_path}/{save_states.remote_name(identifier, file_id)}",
+                    'played': state['timestamp'],
+                    'size': f['local_size'] or f['dropbox_size'],
+                    # only on one side so far, nothing there to snapshot
+                    'new': not (f['local_path'] and f['dropbox_path'])
+                }
+
+                if not f['dropbox_path']:
+                    sync_log.info("Queued upload of new %s", item['name'])
+                    self.state_upload_queue.append(item)
+                    continue
+                if not f['local_path']:
+                    sync_log.info("Queued download of new %s", item['name'])
+                    self.state_download_queue.append(item)
+                    continue
+
+                # unchanged states are never re-sent, whatever their timestamps say
+                if f['local_size'] == f['dropbox_size'] and \
+                        self.same_content(f):
                     continue
 
+                local_time, dropbox_time = self.comparable_times(
+                    f['local_modified'], f['dropbox_modified'])
                 if local_time > dropbox_time:
-                    print("upload queue appended")
-                    # Local is newer, upload to Dropbox
-                    self.create_metadata_file(self.sav_map[identifier]['local_path'], info['dropbox_header_path'], identifier)
-                    revised_metadata_path = info['dropbox_header_path'].split("/")[2] 
-                    self.upload_queue.append({
-                        'identifier': identifier,
-                        'name': info['name'],
-                        'local_path': info['local_path'],
-                        'dropbox_path': info['dropbox_path'],
-                        'local_header_path': info['local_header_path'],
-                        'dropbox_header_path': revised_metadata_path
-                    })
+                    self.state_upload_queue.append(item)
                 else:
-                    # Dropbox is newer, download to local
+                    self.state_download_queue.append(item)
 
-                    print("download queue appended")
-                    self.download_queue.append({
-                        'identifier': identifier,
-                        'name': info['name'],
-                        'local_path': info['local_path'],
-                        'dropbox_path': info['dropbox_path']
-                    })
+    def same_content(self, info):
+        """Compare content hashes, only reads the local file when the backend has a hash"""
+        try:
+            remote_hash = info.get('dropbox_hash') or \
+                self.backend.content_hash(info['dropbox_path'])
+            if not remote_hash:
+                return False
+            # bounded across every library synced in this process
+            pool = shared_pool(
+                "hash", self.config_manager.config.get("hash_workers", 2))
+            local_hash = pool.submit(profiled(dropbox_content_hash), info['local_path'])
+            return remote_hash == local_hash.result()
+        except Exception:
+            return False
 
     def execute_sync(self, callback=None):
         """Execute the sync operations: Items in upload should not also be in download!! (there could be a condition)"""
 
-        total_operations = len(self.upload_queue) + len(self.download_queue)
+        total_operations = len(self.upload_queue) + len(self.download_queue) + \
+            len(self.state_upload_queue) + len(self.state_download_queue)
         completed = 0
 
-        # Process uploads
-        for item in self.upload_queue:
-            try:
-                success = self.dropbox_manager.upload_file(
-                    item['local_path'],
-                    item['dropbox_path']
-                )
-                completed += 1
-                
-                success = self.dropbox_manager.upload_file(
-                    item['local_header_path'],
-                    item['dropbox_header_path']
-                )
-                completed += 1
-                if callback:
-                    callback(completed, total_operations,
-                             f"Uploaded {item['name']}", success)
-                
-            except Exception as e:
-                if callback:
-                    callback(completed, total_operations,
-                             f"Error uploading {item['name']}: {e}", False)
+        priority = self.order_queues()
 
-        # Process downloads
-        for item in self.download_queue:
-            try:
-                # Create a temporary file path to avoid overwriting the original
-                temp_path = item['local_path'] + '.tmp'
-
-                success = self.dropbox_manager.download_file(
-                    item['dropbox_path'],
-                    temp_path
-                )
-
-                if success:
-                    # If download was successful, replace the original file
-                    os.replace(temp_path, item['local_path'])
-
-                completed += 1
-                if callback:
-                    callback(completed, total_operations,
-                             f"Downloaded {item['name']}", success)
-            except Exception as e:
-                if callback:
-                    callback(completed, total_operations,
-                             f"Error downloading {item['name']}: {e}", False)
+        # Save states go last and yield bandwidth to any battery save
+        transfers = [(transfer, item, priority)
+                     for transfer, item in self.save_transfers()]
+        transfers += [(transfer, item, PRIORITY_STATE)
+                      for transfer, item in self.state_transfers()]
 
-                # Clean up temp file if it exists
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+        for transfer, item, item_priority in transfers:
+            done, success, message = transfer(item, item_priority)
+            completed += done
+            if callback:
+                callback(completed, total_operations, message, success)
 
         return completed
 
-    def run_sync(self, progress_callback=None):
-        """Run the complete sync process"""
-        # Load data from database
-        if not self.load_game_data():
-            return False, "Failed to load game data from database"
+    def order_queues(self):
+        """Sort the queues for transfer and return the priority for this run"""
+        # most recently played first, then smallest first so most games
+        # finish early under a tight budget
+        self.upload_queue.sort(key=lambda item: (
+            -item['played'].timestamp(), self._file_size(item['local_path'])))
+        self.download_queue.sort(key=lambda item: -item['played'].timestamp())
+        self.state_upload_queue.sort(key=lambda item: (
+            -item['played'].timestamp(), item['size'] or 0))
+        self.state_download_queue.sort(key=lambda item: (
+            -item['played'].timestamp(), item['size'] or 0))
+
+        # a single changed save should not wait behind someone's backfill
+        total_operations = len(self.upload_queue) + len(self.download_queue)
+        return priority_for(total_operations, self.config_manager.config)
+
+    def state_local_path(self, identifier, file_id):
+        """Where a save state file lives locally, whether or not it exists yet"""
+        f = self.state_map.get(identifier, {}).get('files', {}).get(file_id)
+        if f and f['local_path']:
+            return f['local_path']
+        folder = os.path.join(
+            self.local_path,
+            self.config_manager.config.get("save_states_folder", "Save States"))
+        return os.path.join(folder, identifier + save_states.STATE_FILES[file_id])
+
+    def save_transfers(self):
+        """(transfer, item) for every battery save, most recently played first
+
+        Uploads and downloads are interleaved, call order_queues() first.
+        """
+        return self._by_played((self.upload_item, self.upload_queue),
+                               (self.download_item, self.download_queue))
+
+    def state_transfers(self):
+        """Like save_transfers(), for save state files"""
+        return self._by_played((self.upload_state_item, self.state_upload_queue),
+                               (self.download_item, self.state_download_queue))
+
+    def _by_played(self, *queues):
+        jobs = [[(transfer, item) for item in items] for transfer, items in queues]
+        # each queue is already sorted, so merging keeps their tie-breaks
+        return list(heapq.merge(*jobs, key=lambda job: -job[1]['played'].timestamp()))
+
+    def upload_item(self, item, priority):
+        """Upload one queued save and its header, returns (operations done, success, message)
+
+        The pair counts as one operation, like every other queued item, so
+        progress totals can be taken from the queue lengths.
+        """
+        done = 0
+        try:
+            # keep the remote version we are about to overwrite
+            self.snapshot_remote(item, priority)
+
+            success = self.backend.upload_file(
+                item['local_path'],
+                item['dropbox_path'],
+                priority
+            )
+            done += 1
+        except Exception as e:
+            return self._result(done, False, "upload", item['name'], e)
+
+        # the outcome is the save's, a header problem is only a warning
+        if success:
+            self.upload_header(item, priority)
+        return self._result(done, success, "upload", item['name'])
+
+    def upload_header(self, item, priority):
+        """Upload the header next to an uploaded save, if we have one locally"""
+        if not item.get('local_header_path'):
+            sync_log.debug("No local header for %s, remote header left as is",
+                           item['name'])
+            return False
+        try:
+            if self.backend.upload_file(item['local_header_path'],
+                                        item['dropbox_header_path'], priority):
+                return True
+            sync_log.warning("Uploaded %s but not its header", item['name'])
+        except Exception as e:
+            sync_log.warning("Uploaded %s but not its header: %s", item['name'], e)
+        return False
+
+    def upload_state_item(self, item, priority=PRIORITY_STATE):
+        """Upload one save state file, returns (operations done, success, message)"""
+        try:
+            if not item['new']:
+                self.snapshot_remote(item, priority)
+            success = self.backend.upload_file(
+                item['local_path'],
+                item['dropbox_path'],
+                priority
+            )
+            return self._result(1, success, "upload", item['name'])
+        except Exception as e:
+            return self._result(0, False, "upload", item['name'], e)
+
+    def download_item(self, item, priority):
+        """Download one queued save, returns (operations done, success, message)"""
+        # Create a temporary file path to avoid overwriting the original
+        temp_path = item['local_path'] + '.tmp'
+        try:
+            # new save states land in a folder that may not exist yet
+            os.makedirs(os.path.dirname(item['local_path']) or ".", exist_ok=True)
+            success = self.backend.download_file(
+                item['dropbox_path'],
+                temp_path,
+                priority
+            )
+
+            if success:
+                # keep the local version before it gets replaced
+                store, key = self.snapshot_target(item)
+                store.capture(item['local_path'], key)
+                # If download was successful, replace the original file
+                os.replace(temp_path, item['local_path'])
+
+            return self._result(1, success, "download", item['name'])
+        except Exception as e:
+            # Clean up temp file if it exists
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return self._result(0, False, "download", item['name'], e)
+
+    def _result(self, done, success, action, name, error=None):
+        """Record a transfer outcome in the sync log and hand it back
+
+        action is "upload" or "download", error the exception if one was raised.
+        """
+        if success:
+            message = f"{action.capitalize()}ed {name}"
+            sync_log.info(message)
+        else:
+            if error is not None:
+                message = f"Error {action}ing {name}: {error}"
+            else:
+                message = f"Failed to {action} {name}"
+            sync_log.error(message)
+        return done, success, message
+
+    def snapshot_target(self, item):
+        """Snapshot store and history key for a queued item"""
+        if 'file_id' in item:
+            # a state's image and thumbnail each keep their own history
+            return self.state_snapshots, f"{item['identifier']}-{item['file_id']}"
+        return self.snapshots, item['identifier']
+
+    def snapshot_remote(self, item, priority):
+        """Pull the current Dropbox copy of a queued upload into the snapshot store"""
+        config = self.config_manager.config
+        if 'file_id' in item:
+            # a full extra download of a multi-MB state, so opt-in
+            enabled = config.get("state_snapshot_remote_before_upload", False)
+        else:
+            enabled = config.get("snapshot_remote_before_upload", True)
+        if not enabled:
+            return None
+
+        store, key = self.snapshot_target(item)
+        dropbox_path = item['dropbox_path']
+        temp_path = os.path.join(store.root, key + '.remote.tmp')
+        os.makedirs(store.root, exist_ok=True)
+        try:
+            if not self.backend.download_file(dropbox_path, temp_path,
+                                                      priority):
+                return None
+            return store.capture(temp_path, key, source="dropbox",
+                                 original_path=dropbox_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def restore_snapshot(self, identifier, sha1=None, file_id=None):
+        """Restore a save from the snapshot store, the newest one by default
+
+        With a file_id ("saveState" or "thumbnail") identifier is a save state
+        and the file is restored from the save state store.
+        """
+        store, key = self.snapshot_target(
+            {'identifier': identifier, 'file_id': file_id} if file_id
+            else {'identifier': identifier})
+        history = store.history(key)
+        if sha1:
+            history = [e for e in history if e['sha1'] == sha1]
+        if not history:
+            return False
 
-        # Scan local saves
-        if not self.scan_local_saves():
-            return False, "Failed to scan local saves"
+        entry = history[0]
+        if file_id:
+            dest_path = self.state_local_path(identifier, file_id)
+        else:
+            dest_path = self.sav_map.get(identifier, {}).get('local_path')
+        if not dest_path and entry['source'] == "local":
+            dest_path = entry['path']
+        if not dest_path:
+            return False
 
-        # Scan Dropbox saves
-        if not self.scan_dropbox_saves():
-            return False, "Failed to scan Dropbox saves"
+        # stage the old version first, capturing the current save below may
+        # evict the very object we are restoring
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        staged_path = dest_path + '.restore'
+        if not store.restore(entry['sha1'], staged_path):
+            return False
+        try:
+            # the save we are about to replace becomes a snapshot as well
+            store.capture(dest_path, key)
+            os.replace(staged_path, dest_path)
+        finally:
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+        return True
+
+    def scan_pipelined(self):
+        """Load the database, walk local saves and list the remote folder at once
+
+        The remote listing starts first since it is usually the slowest. Remote
+        entries are matched as they arrive and games are planned most recently
+        played first, each as soon as it and every more recent game have their
+        local save, remote save and header; the rest are planned in the same
+        order when the listing ends. Returns an error message, or None on success.
+        """
+        entries = queue.Queue()
+        finished = object()
+        cancelled = threading.Event()
 
-        # Compare and queue files
-        self.compare_and_queue()
+        def list_remote():
+            try:
+                for entry in self.backend.iter_folder(self.dropbox_path):
+                    if cancelled.is_set():
+                        break
+                    entries.put(entry)
+            except Exception as e:
+                entries.put(e)
+            finally:
+                entries.put(finished)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            remote = executor.submit(profiled(list_remote))
+            local = executor.submit(profiled(self.walk_local_saves))
+            try:
+                # sqlite connections belong to the thread that opened them
+                if not self.load_game_data():
+                    return "Failed to load game data from database"
+
+                try:
+                    self.apply_local_saves(local.result())
+                    self.scan_local_states()
+                except Exception as e:
+                    sync_log.error("Error scanning local saves: %s", e)
+                    return "Failed to scan local saves"
+
+                # sav_map is most recently played first, plan games in that
+                # order as far as the listing so far allows
+                order = list(self.sav_map)
+                next_game = 0
+                while True:
+                    entry = entries.get()
+                    if entry is finished:
+                        break
+                    if isinstance(entry, Exception):
+                        sync_log.error("Error scanning Dropbox saves: %s", entry)
+                        return "Failed to scan Dropbox saves"
+
+                    if not self.apply_remote_entry(entry):
+                        continue
+                    while next_game < len(order):
+                        info = self.sav_map[order[next_game]]
+                        # without a local save there is nothing to plan
+                        if info['local_path'] and not (
+                                info['dropbox_path'] and info['dropbox_header_path']):
+                            break
+                        self.plan_sync(order[next_game], info)
+                        next_game += 1
+            finally:
+                cancelled.set()
+                remote.result()
+
+        for identifier in order[next_game:]:
+            self.plan_sync(identifier, self.sav_map[identifier])
+        self.plan_save_states()
+        return None
+
+    def run_sync(self, progress_callback=None):
+        """Run the complete sync process, profiled when diagnostics are on"""
+        with self.profiler.run("sync"):
+            return self._run_sync(progress_callback)
+
+    def _run_sync(self, progress_callback=None):
+        sync_log.info("Sync started")
+        error = self.prepare_sync()
+        if error:
+            sync_log.error(error)
+            return False, error
 
         # If nothing to sync, we're done
-        if not self.upload_queue and not self.download_queue:
+        if not self.has_work():
+            sync_log.info("No files needed syncing")
             return True, "No files needed syncing"
 
         # Execute sync operations
         completed = self.execute_sync(progress_callback)
 
+        sync_log.info("Completed %d sync operations", completed)
         return True, f"Completed {completed} sync operations"
+
+    def prepare_sync(self):
+        """Scan everything and fill the upload/download queues, returns an error message or None"""
+        if self.config_manager.config.get("pipelined_scan", True):
+            # database, local and remote scans overlap, planning as we go
+            return self.scan_pipelined()
+        else:
+            # Load data from database
+            if not self.load_game_data():
+                return "Failed to load game data from database"
+
+            # Scan local saves
+            if not self.scan_local_saves():
+                return "Failed to scan local saves"
+
+            # Scan Dropbox saves
+            if not self.scan_dropbox_saves():
+                return "Failed to scan Dropbox saves"
+
+            # Compare and queue files
+            self.compare_and_queue()
+            self.plan_save_states()
+        return None
+
+    def has_work(self):
+        return bool(self.upload_queue or self.download_queue or
+                    self.state_upload_queue or self.state_download_queue)
     
     
     
@@ -330,12 +788,12 @@ class SyncManager():
             }
 
             revised_metadata_path = metadata_path.split("/")[2] 
-            print(revised_metadata_path)
+            sync_log.debug("Writing metadata file %s", revised_metadata_path)
             # Write metadata to file
             with open(self.local_path +  "/" + revised_metadata_path, 'w') as f:
                 json.dump(metadata, f)
         except Exception as e:
-            print(f"Error creating metadata file: {e}")
+            sync_log.error("Error creating metadata file: %s", e)
 
                 
     def generate_version_id(self):
@@ -345,6 +803,12 @@ class SyncManager():
         return version_identifier
 
 
+    def _file_size(self, file_path):
+        try:
+            return os.path.getsize(file_path)
+        except (OSError, TypeError):
+            return 0
+
     def calculate_sha1(self, file_path):
         """Calculate SHA1 hash of a file"""
         hasher = hashlib.sha1()
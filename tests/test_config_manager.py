@@ -0,0 +1,53 @@
+import os
+
+from config_manager import ConfigManager
+
+
+def test_profile_config_is_merged_once_and_refreshed_on_write(tmp_path):
+    config_manager = ConfigManager(str(tmp_path / "config.json"))
+    config_manager.config["profiles"] = [{"name": "kid", "recent_days": 7}]
+    profile, = config_manager.profiles()
+
+    config = profile.config
+    assert config is profile.config
+    assert config["recent_days"] == 7
+    assert config["snapshot_path"] == os.path.join("snapshots", "kid")
+    assert "profiles" not in config
+
+    profile.set_config("recent_days", 3)
+    assert profile.config["recent_days"] == 3
+    assert config_manager.config["recent_days"] == 0
+
+
+def test_older_config_files_keep_new_defaults(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{"local_saves_path": "/saves"}')
+    config = ConfigManager(str(path)).config
+    assert config["local_saves_path"] == "/saves"
+    assert config["transfer_workers"] == 4
+
+
+def test_libraries_include_the_top_level_library_once(tmp_path):
+    config_manager = ConfigManager(str(tmp_path / "config.json"))
+    assert config_manager.libraries() == []
+
+    config_manager.config["delta_db_path"] = "/main/Delta.sqlite"
+    main, = config_manager.libraries()
+    assert main.name == "default"
+    assert main.config["snapshot_path"] == "snapshots"
+
+    config_manager.config["profiles"] = [{"name": "kid", "delta_db_path": "/kid.sqlite"}]
+    assert [lib.name for lib in config_manager.libraries()] == ["default", "kid"]
+
+    # a profile that inherits the top level database is that library
+    config_manager.config["profiles"] = [{"name": "mine"}]
+    assert [lib.name for lib in config_manager.libraries()] == ["mine"]
+
+
+def test_top_level_view_writes_to_the_top_level(tmp_path):
+    config_manager = ConfigManager(str(tmp_path / "config.json"))
+    config_manager.config["delta_db_path"] = "/main/Delta.sqlite"
+    main, = config_manager.libraries()
+    main.set_config("recent_days", 5)
+    assert config_manager.config["recent_days"] == 5
+    assert main.config["recent_days"] == 5
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("dropbox", "PySide6", "dotenv"):
+    pytest.importorskip(module)
+
+from dropbox_manager import UPLOAD_CHUNK_SIZE, DropboxManager  # noqa: E402
+from throttle import shared_budget  # noqa: E402
+
+
+class FakeClient:
+    """Records upload calls, with the cursor offset as it was at call time"""
+
+    def __init__(self):
+        self.calls = []
+
+    def files_upload(self, data, path, mode=None):
+        self.calls.append(("upload", len(data), None))
+
+    def files_upload_session_start(self, data):
+        self.calls.append(("start", len(data), None))
+        return SimpleNamespace(session_id="session")
+
+    def files_upload_session_append_v2(self, data, cursor):
+        self.calls.append(("append", len(data), cursor.offset))
+
+    def files_upload_session_finish(self, data, cursor, commit):
+        self.calls.append(("finish", len(data), cursor.offset))
+        self.committed = commit.path
+
+
+@pytest.fixture
+def manager():
+    shared_budget({})
+    manager = DropboxManager(SimpleNamespace(config={}))
+    manager.dbx = FakeClient()
+    return manager
+
+
+def test_small_files_go_up_in_one_request(tmp_path, manager):
+    path = tmp_path / "save.sav"
+    path.write_bytes(b"x" * 1000)
+
+    assert manager.upload_file(str(path), "/Delta/GameSave-A-gameSave")
+    assert manager.dbx.calls == [("upload", 1000, None)]
+
+
+@pytest.mark.parametrize("size", [3 * UPLOAD_CHUNK_SIZE, 2 * UPLOAD_CHUNK_SIZE + 123])
+def test_large_files_use_a_session_with_running_offsets(tmp_path, manager, size):
+    path = tmp_path / "state.svs"
+    path.write_bytes(b"x" * size)
+
+    assert manager.upload_file(str(path), "/Delta/SaveState-S-saveState")
+
+    calls = manager.dbx.calls
+    assert calls[0] == ("start", UPLOAD_CHUNK_SIZE, None)
+    assert calls[1] == ("append", UPLOAD_CHUNK_SIZE, UPLOAD_CHUNK_SIZE)
+    assert calls[-1] == ("finish", size - 2 * UPLOAD_CHUNK_SIZE, 2 * UPLOAD_CHUNK_SIZE)
+    assert sum(length for _, length, _ in calls) == size
+    assert manager.dbx.committed == "/Delta/SaveState-S-saveState"
+
+
+def test_rate_limited_uploads_use_budget_sized_chunks(tmp_path, manager):
+    # a quarter second of a 4 MiB/s budget, well under the one second burst
+    shared_budget({"upload_rate_limit": 4 * 1024 * 1024})
+    try:
+        path = tmp_path / "save.sav"
+        path.write_bytes(b"x" * (2 * 1024 * 1024 + 512 * 1024))
+        assert manager.upload_file(str(path), "/Delta/GameSave-A-gameSave")
+    finally:
+        shared_budget({})
+
+    chunk = 1024 * 1024
+    assert [(kind, length) for kind, length, _ in manager.dbx.calls] == [
+        ("start", chunk), ("append", chunk), ("finish", chunk // 2)]
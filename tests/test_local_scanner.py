@@ -0,0 +1,72 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from local_scanner import DEFAULT_SAVE_EXTENSIONS, extension_ranks, scan_save_tree
+
+
+def write(path, data=b"save", mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if mtime:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    write(tmp_path / "Top Game.sav")
+    write(tmp_path / "gba" / "Pokemon Emerald.sav")
+    write(tmp_path / "snes" / "nested" / "Super Metroid.srm")
+    write(tmp_path / "snes" / "notes.txt")
+    write(tmp_path / ".hidden" / "Ignored.sav")
+    return tmp_path
+
+
+def test_walks_subfolders_and_keys_by_stem(tree):
+    saves = scan_save_tree(str(tree), workers=1)
+    assert sorted(saves) == ["Pokemon Emerald", "Super Metroid", "Top Game"]
+    save = saves["Super Metroid"]
+    assert save.path == str(tree / "snes" / "nested" / "Super Metroid.srm")
+    assert save.size == 4
+
+
+def test_non_recursive_only_scans_the_root(tree):
+    assert list(scan_save_tree(str(tree), recursive=False)) == ["Top Game"]
+
+
+def test_parallel_walk_matches_serial_walk(tree):
+    serial = scan_save_tree(str(tree), workers=1)
+    assert scan_save_tree(str(tree), workers=4) == serial
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert scan_save_tree(str(tree), executor=executor) == serial
+
+
+def test_extension_precedence_beats_newer_files(tmp_path):
+    write(tmp_path / "Game.srm", mtime=2000)
+    write(tmp_path / "a" / "Game.sav", mtime=1000)
+    save = scan_save_tree(str(tmp_path), workers=1)["Game"]
+    assert save.path.endswith("Game.sav")
+
+
+def test_newest_file_breaks_ties(tmp_path):
+    write(tmp_path / "a" / "Game.sav", mtime=1000)
+    write(tmp_path / "b" / "Game.sav", mtime=2000)
+    write(tmp_path / "c" / "Game.sav", mtime=1500)
+    save = scan_save_tree(str(tmp_path), workers=4)["Game"]
+    assert save.path == str(tmp_path / "b" / "Game.sav")
+
+
+def test_names_with_dots_keep_everything_before_the_extension(tmp_path):
+    write(tmp_path / "Mario Kart Super Circuit v1.1.SAV")
+    write(tmp_path / "readme.sav.bak")
+    assert list(scan_save_tree(str(tmp_path))) == ["Mario Kart Super Circuit v1.1"]
+
+
+def test_custom_extensions_are_normalised():
+    assert extension_ranks(["SAV", ".srm", "sav"]) == {".sav": 0, ".srm": 1}
+    assert extension_ranks(None) == extension_ranks(DEFAULT_SAVE_EXTENSIONS)
+
+
+def test_missing_root_is_empty(tmp_path):
+    assert scan_save_tree(str(tmp_path / "missing"), workers=1) == {}
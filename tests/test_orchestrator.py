@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+for module in ("dropbox", "PySide6", "pytz", "tzlocal", "dotenv"):
+    pytest.importorskip(module)
+
+from config_manager import ConfigManager  # noqa: E402
+from orchestrator import SyncOrchestrator, TransferScheduler  # noqa: E402
+from sync_manager import SyncManager  # noqa: E402
+from test_sync_manager import HOUR_AGO, add_save_state, make_library, write  # noqa: E402
+
+
+def test_scheduler_round_robins_between_libraries():
+    order = []
+    scheduler = TransferScheduler(workers=1)
+    gate = threading.Event()
+    blocker = scheduler.submit("x", gate.wait)
+    futures = [scheduler.submit(name, order.append, f"{name}{i}")
+               for name in ("a", "b") for i in range(2)]
+    gate.set()
+    blocker.result()
+    for future in futures:
+        future.result()
+    scheduler.close()
+    assert order == ["a0", "b0", "a1", "b1"]
+
+
+def test_save_states_wait_for_battery_saves(tmp_path, monkeypatch):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    config_manager.config["profiles"] = [{"name": "only"}]
+    add_save_state(tmp_path, "S1")
+    remote = tmp_path / "remote" / "Delta"
+    write(tmp_path / "local" / "BBB.srm", b"old", HOUR_AGO)
+    write(remote / "GameSave-BBB-gameSave", b"new")
+    write(remote / "gamesave-BBB", b"{}")
+    write(remote / "SaveState-S1-saveState", b"state")
+
+    events = []
+    download_item = SyncManager.download_item
+
+    def recording_download(self, item, priority):
+        kind = "state" if 'file_id' in item else "save"
+        events.append(("start", kind))
+        if kind == "save":
+            time.sleep(0.05)
+        result = download_item(self, item, priority)
+        events.append(("end", kind))
+        return result
+
+    monkeypatch.setattr(SyncManager, "download_item", recording_download)
+    results = SyncOrchestrator(config_manager).run_all()
+
+    assert results["only"][0]
+    assert events.index(("start", "state")) > events.index(("end", "save"))
+
+
+def test_all_libraries_are_profiled_as_one_run(tmp_path):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    config_manager.config.update(
+        profiles=[{"name": "one"}, {"name": "two"}],
+        profiling_enabled=True,
+        diagnostics_path=str(tmp_path / "diagnostics"))
+
+    orchestrator = SyncOrchestrator(config_manager)
+    results = orchestrator.run_all()
+
+    assert set(results) >= {"one", "two"}
+    reports = sorted(p.name for p in (tmp_path / "diagnostics").glob("*.prof"))
+    assert len(reports) == 1 and reports[0].startswith("sync-all-")
+    assert orchestrator.profiler.last_report.endswith(reports[0])
+
+
+def test_progress_never_passes_the_total(tmp_path):
+    config_manager = make_library(tmp_path, [("Game A", "AAA"), ("Game B", "BBB")])
+    config_manager.config["profiles"] = [{"name": "only"}]
+    remote = tmp_path / "remote" / "Delta"
+    write(tmp_path / "local" / "AAA.srm", b"new")
+    write(remote / "GameSave-AAA-gameSave", b"old", HOUR_AGO)
+    write(remote / "gamesave-AAA", b"{}")
+    write(tmp_path / "local" / "BBB.srm", b"old", HOUR_AGO)
+    write(remote / "GameSave-BBB-gameSave", b"new")
+    write(remote / "gamesave-BBB", b"{}")
+
+    progress = []
+    SyncOrchestrator(config_manager).run_all(
+        lambda name, completed, total, message, success:
+        progress.append((completed, total)))
+
+    assert progress[-1] == (2, 2)
+    assert all(completed <= total for completed, total in progress)
+
+
+def test_single_library_config_is_synced(tmp_path):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    remote = tmp_path / "remote" / "Delta"
+    write(tmp_path / "local" / "BBB.srm", b"old", HOUR_AGO)
+    write(remote / "GameSave-BBB-gameSave", b"new")
+    write(remote / "gamesave-BBB", b"{}")
+
+    results = SyncOrchestrator(config_manager).run_all()
+
+    assert list(results) == ["default"] and results["default"][0]
+    assert (tmp_path / "local" / "BBB.srm").read_bytes() == b"new"
+
+
+def test_nothing_configured_is_an_error(tmp_path):
+    with pytest.raises(ValueError, match="No library configured"):
+        SyncOrchestrator(ConfigManager(str(tmp_path / "config.json"))).run_all()
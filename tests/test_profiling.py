@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import profiling
+from profiling import THREADS_NEED_PROFILING, SyncProfiler, profiled
+
+
+def busy_worker_task():
+    return sum(range(1000))
+
+
+def test_worker_threads_are_merged_into_report(tmp_path):
+    profiler = SyncProfiler({"profiling_enabled": True,
+                             "diagnostics_path": str(tmp_path)})
+    with profiler.run("test"):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(profiled(busy_worker_task)).result() == 499500
+
+    report = (tmp_path / profiler.last_report.replace(".prof", ".txt")).read_text()
+    assert "busy_worker_task" in report
+    # 3.12+ records every thread in the main profile, nothing to merge
+    merged = 1 if THREADS_NEED_PROFILING else 0
+    assert f"{merged} worker tasks merged" in report
+
+
+def test_profiled_is_a_no_op_outside_a_run():
+    assert profiled(busy_worker_task) is busy_worker_task
+
+
+@pytest.mark.skipif(not THREADS_NEED_PROFILING,
+                    reason="worker threads are not wrapped from Python 3.12")
+def test_tasks_finishing_after_the_run_are_dropped(tmp_path):
+    profiler = SyncProfiler({"profiling_enabled": True,
+                             "diagnostics_path": str(tmp_path)})
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with profiler.run("test"):
+            late = executor.submit(profiled(release.wait))
+        release.set()
+        late.result()
+    assert profiler._thread_profiles == []
+
+
+def test_profiled_leaves_threads_to_cprofile_from_312(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "THREADS_NEED_PROFILING", False)
+    profiler = SyncProfiler({"profiling_enabled": True,
+                             "diagnostics_path": str(tmp_path)})
+    with profiler.run("test"):
+        assert profiled(busy_worker_task) is busy_worker_task
@@ -0,0 +1,57 @@
+from storage_backend import LocalFolderBackend, dropbox_content_hash
+
+
+def make_remote(tmp_path, names):
+    folder = tmp_path / "remote" / "Delta"
+    folder.mkdir(parents=True)
+    for name in names:
+        (folder / name).write_bytes(name.encode())
+    (folder / "sub").mkdir()
+    return LocalFolderBackend(str(tmp_path / "remote"), page_size=2)
+
+
+def test_list_folder_pages_through_sorted_snapshot(tmp_path):
+    backend = make_remote(tmp_path, ["c", "a", "b"])
+
+    entries, cursor, has_more = backend.list_folder("/Delta")
+    assert [e.name for e in entries] == ["a", "b"]
+    assert has_more
+
+    # files added after the first page don't shift the cursor
+    (tmp_path / "remote" / "Delta" / "0").write_bytes(b"late")
+    entries, cursor, has_more = backend.list_folder("/Delta", cursor)
+    assert [e.name for e in entries] == ["c", "sub"]
+    assert not has_more
+
+
+def test_iter_folder_marks_folders_and_skips_hashing(tmp_path):
+    backend = make_remote(tmp_path, ["GameSave-X-gameSave"])
+
+    entries = {e.name: e for e in backend.iter_folder("/Delta")}
+    assert entries["sub"].is_folder
+    save = entries["GameSave-X-gameSave"]
+    assert not save.is_folder
+    assert save.path == "/Delta/GameSave-X-gameSave"
+    assert save.size == len("GameSave-X-gameSave")
+    assert save.content_hash is None
+
+
+def test_stat_hash_matches_local_file(tmp_path):
+    backend = make_remote(tmp_path, ["a"])
+    local = tmp_path / "a"
+    local.write_bytes(b"a")
+
+    assert backend.stat("/Delta/a").content_hash == dropbox_content_hash(str(local))
+    assert backend.stat("/Delta/missing") is None
+
+
+def test_upload_and_download_round_trip(tmp_path):
+    backend = make_remote(tmp_path, [])
+    source = tmp_path / "save.sav"
+    source.write_bytes(b"save data")
+
+    assert backend.upload_file(str(source), "/Delta/new/GameSave-Y-gameSave")
+    assert backend.download_file("/Delta/new/GameSave-Y-gameSave",
+                                 str(tmp_path / "back.sav"))
+    assert (tmp_path / "back.sav").read_bytes() == b"save data"
+    assert not backend.download_file("/Delta/missing", str(tmp_path / "x"))
@@ -0,0 +1,45 @@
+import logging
+import threading
+
+from sync_log import SyncEventLog
+
+
+class Counted:
+    formatted = 0
+
+    def __str__(self):
+        Counted.formatted += 1
+        return "counted"
+
+
+def test_args_are_only_formatted_for_kept_events():
+    log = SyncEventLog(level=logging.INFO)
+    log.debug("skipped %s", Counted())
+    assert Counted.formatted == 0 and not log.since()
+
+    log.info("kept %s and %d%%", Counted(), 5)
+    assert [e.message for e in log.since()] == ["kept counted and 5%"]
+
+
+def test_messages_without_args_are_left_alone():
+    log = SyncEventLog()
+    log.info("100% done")
+    assert log.since()[0].message == "100% done"
+
+
+def test_buffer_order_matches_seq_under_contention():
+    log = SyncEventLog(capacity=100000)
+
+    def spam():
+        for i in range(2000):
+            log.info("event %d", i)
+
+    threads = [threading.Thread(target=spam) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    seqs = [e.seq for e in log.events]
+    assert seqs == sorted(seqs)
+    assert len(log.since(seqs[100])) == len(seqs) - 101
@@ -0,0 +1,284 @@
+import logging
+import os
+import sqlite3
+import time
+
+import pytest
+
+# the sync engine imports the Dropbox client and the GUI toolkit
+for module in ("dropbox", "PySide6", "pytz", "tzlocal", "dotenv"):
+    pytest.importorskip(module)
+
+from config_manager import ConfigManager  # noqa: E402
+from sync_log import sync_log  # noqa: E402
+from sync_manager import SyncManager  # noqa: E402
+
+HOUR_AGO = time.time() - 3600
+
+
+def make_library(tmp_path, games):
+    """games: [(name, identifier)], every game gets a ZGAMESAVE row"""
+    db_path = tmp_path / "Delta.sqlite"
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE zgame (Z_PK INTEGER, ZNAME TEXT, ZIDENTIFIER TEXT);
+        CREATE TABLE zgamesave (ZIDENTIFIER TEXT, ZMODIFIEDDATE REAL, ZGAME INTEGER);
+        CREATE TABLE zsavestate (ZIDENTIFIER TEXT, ZMODIFIEDDATE REAL, ZGAME INTEGER);
+    """)
+    for pk, (name, identifier) in enumerate(games, start=1):
+        conn.execute("INSERT INTO zgame VALUES (?, ?, ?)", (pk, name, identifier))
+        conn.execute("INSERT INTO zgamesave VALUES (?, ?, ?)",
+                     (identifier, 700000000 + pk, pk))
+    conn.commit()
+    conn.close()
+
+    (tmp_path / "local").mkdir()
+    (tmp_path / "remote" / "Delta").mkdir(parents=True)
+
+    config_manager = ConfigManager(str(tmp_path / "config.json"))
+    config_manager.config.update(
+        delta_db_path=str(db_path),
+        local_saves_path=str(tmp_path / "local"),
+        dropbox_folder_path="/Delta",
+        storage_backend="local",
+        local_backend_path=str(tmp_path / "remote"),
+        snapshot_path=str(tmp_path / "snapshots"),
+        log_file="")
+    return config_manager
+
+
+def write(path, data, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if mtime:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture(params=[True, False], ids=["pipelined", "sequential"])
+def pipelined(request):
+    return request.param
+
+
+def test_newer_remote_save_is_downloaded_and_snapshotted(tmp_path, pipelined):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    config_manager.config["pipelined_scan"] = pipelined
+    remote = tmp_path / "remote" / "Delta"
+    write(tmp_path / "local" / "BBB.srm", b"old local", HOUR_AGO)
+    write(remote / "GameSave-BBB-gameSave", b"new remote")
+    write(remote / "gamesave-BBB", b"{}")
+
+    sync_manager = SyncManager(config_manager, None)
+    success, _ = sync_manager.run_sync()
+
+    assert success
+    assert (tmp_path / "local" / "BBB.srm").read_bytes() == b"new remote"
+    assert [e['source'] for e in sync_manager.snapshots.history("BBB")] == ["local"]
+
+
+def test_newer_local_save_named_after_game_is_uploaded(tmp_path, pipelined):
+    config_manager = make_library(tmp_path, [("Game A", "AAA")])
+    config_manager.config["pipelined_scan"] = pipelined
+    remote = tmp_path / "remote" / "Delta"
+    write(tmp_path / "local" / "gba" / "Game A.sav", b"new local")
+    write(remote / "GameSave-AAA-gameSave", b"old remote", HOUR_AGO)
+    write(remote / "gamesave-AAA", b"{}")
+
+    seq = sync_log.since()[-1].seq if sync_log.since() else 0
+    sync_manager = SyncManager(config_manager, None)
+    success, message = sync_manager.run_sync()
+
+    assert (success, message) == (True, "Completed 1 sync operations")
+    assert (remote / "GameSave-AAA-gameSave").read_bytes() == b"new local"
+    events = sync_log.since(seq)
+    assert "Uploaded Game A" in [e.message for e in events]
+    assert not [e for e in events if e.level >= logging.ERROR]
+    history = sync_manager.snapshots.history("AAA")
+    assert history[0]['source'] == "dropbox"
+    assert history[0]['path'] == "/Delta/GameSave-AAA-gameSave"
+
+
+def test_identical_content_is_not_transferred(tmp_path, pipelined):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    config_manager.config["pipelined_scan"] = pipelined
+    remote = tmp_path / "remote" / "Delta"
+    write(tmp_path / "local" / "BBB.srm", b"same", HOUR_AGO)
+    write(remote / "GameSave-BBB-gameSave", b"same")
+    write(remote / "gamesave-BBB", b"{}")
+
+    sync_manager = SyncManager(config_manager, None)
+    success, message = sync_manager.run_sync()
+
+    assert success
+    assert message == "No files needed syncing"
+
+
+def test_excluded_games_are_skipped(tmp_path):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    config_manager.config["exclude_games"] = ["game b"]
+    remote = tmp_path / "remote" / "Delta"
+    write(tmp_path / "local" / "BBB.srm", b"old local", HOUR_AGO)
+    write(remote / "GameSave-BBB-gameSave", b"new remote")
+    write(remote / "gamesave-BBB", b"{}")
+
+    SyncManager(config_manager, None).run_sync()
+
+    assert (tmp_path / "local" / "BBB.srm").read_bytes() == b"old local"
+
+
+def test_restore_snapshot_survives_eviction(tmp_path):
+    config_manager = make_library(tmp_path, [])
+    config_manager.config["snapshot_max_bytes"] = 150
+    sync_manager = SyncManager(config_manager, None)
+    save = tmp_path / "local" / "a.sav"
+    write(save, b"1" * 100)
+    sync_manager.snapshots.capture(str(save), "A")
+    write(save, b"2" * 100)
+
+    assert sync_manager.restore_snapshot("A")
+    assert save.read_bytes() == b"1" * 100
+
+
+def add_save_state(tmp_path, identifier, game_pk=1):
+    conn = sqlite3.connect(tmp_path / "Delta.sqlite")
+    conn.execute("INSERT INTO zsavestate VALUES (?, ?, ?)",
+                 (identifier, 700000100, game_pk))
+    conn.commit()
+    conn.close()
+
+
+def test_one_sided_save_states_are_copied_across(tmp_path, pipelined):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    config_manager.config["pipelined_scan"] = pipelined
+    add_save_state(tmp_path, "REMOTE")
+    add_save_state(tmp_path, "LOCAL")
+    remote = tmp_path / "remote" / "Delta"
+    states = tmp_path / "local" / "Save States"
+    write(remote / "SaveState-REMOTE-saveState", b"remote state")
+    write(remote / "SaveState-REMOTE-thumbnail", b"remote png")
+    write(states / "LOCAL.svs", b"local state")
+
+    sync_manager = SyncManager(config_manager, None)
+    success, _ = sync_manager.run_sync()
+
+    assert success
+    assert (states / "REMOTE.svs").read_bytes() == b"remote state"
+    assert (states / "REMOTE.png").read_bytes() == b"remote png"
+    assert (remote / "SaveState-LOCAL-saveState").read_bytes() == b"local state"
+    assert not (remote / "SaveState-LOCAL-thumbnail").exists()
+
+
+def test_save_states_snapshot_into_their_own_store(tmp_path):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    add_save_state(tmp_path, "S1")
+    remote = tmp_path / "remote" / "Delta"
+    write(tmp_path / "local" / "Save States" / "S1.svs", b"old state", HOUR_AGO)
+    write(remote / "SaveState-S1-saveState", b"new state")
+
+    sync_manager = SyncManager(config_manager, None)
+    sync_manager.run_sync()
+
+    assert sync_manager.snapshots.history("S1") == []
+    history = sync_manager.state_snapshots.history("S1-saveState")
+    assert [e['source'] for e in history] == ["local"]
+    assert sync_manager.state_snapshots.root == \
+        os.path.join(str(tmp_path / "snapshots"), "states")
+
+
+def test_games_are_planned_and_transferred_most_recent_first(tmp_path, pipelined):
+    # the later game in the list is the more recently played one
+    config_manager = make_library(tmp_path, [("Old", "AAA"), ("Up", "MMM"),
+                                             ("New", "ZZZ")])
+    config_manager.config["pipelined_scan"] = pipelined
+    remote = tmp_path / "remote" / "Delta"
+    for identifier in ("AAA", "ZZZ"):
+        write(tmp_path / "local" / f"{identifier}.srm", b"old", HOUR_AGO)
+        write(remote / f"GameSave-{identifier}-gameSave", b"new")
+        write(remote / f"gamesave-{identifier}", b"{}")
+    write(tmp_path / "local" / "MMM.srm", b"new")
+    write(remote / "GameSave-MMM-gameSave", b"old", HOUR_AGO)
+    write(remote / "gamesave-MMM", b"{}")
+
+    sync_manager = SyncManager(config_manager, None)
+    assert sync_manager.prepare_sync() is None
+    # planned before order_queues() gets to sort anything
+    assert [item['identifier'] for item in sync_manager.download_queue] == \
+        ["ZZZ", "AAA"]
+
+    sync_manager.order_queues()
+    assert [(transfer.__name__, item['identifier'])
+            for transfer, item in sync_manager.save_transfers()] == [
+        ("download_item", "ZZZ"), ("upload_item", "MMM"), ("download_item", "AAA")]
+
+
+def test_failed_transfers_are_logged_as_failures(tmp_path):
+    sync_manager = SyncManager(make_library(tmp_path, []), None)
+    assert sync_manager._result(1, True, "upload", "Game A")[2] == "Uploaded Game A"
+    assert sync_manager._result(1, False, "download", "Game A")[2] == \
+        "Failed to download Game A"
+    assert sync_manager._result(0, False, "upload", "Game A", OSError("gone"))[2] == \
+        "Error uploading Game A: gone"
+
+
+def test_local_saves_resolve_by_name_or_identifier(tmp_path):
+    config_manager = make_library(tmp_path, [("Game A", "AAA"), ("Game B", "BBB")])
+    write(tmp_path / "local" / "gba" / "Game A.sav", b"by name", HOUR_AGO)
+    write(tmp_path / "local" / "AAA.srm", b"by identifier")
+    write(tmp_path / "local" / "BBB.sav", b"b")
+    write(tmp_path / "local" / "Unknown Game.sav", b"?")
+
+    sync_manager = SyncManager(config_manager, None)
+    assert sync_manager.load_game_data()
+    assert sync_manager.scan_local_saves()
+
+    # the same game saved under both names, the newer file wins
+    assert sync_manager.sav_map["AAA"]['local_path'] == str(tmp_path / "local" / "AAA.srm")
+    assert sync_manager.sav_map["BBB"]['local_size'] == 1
+    assert "Unknown Game" not in sync_manager.sav_map
+
+
+def test_save_state_snapshots_can_be_restored(tmp_path):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    add_save_state(tmp_path, "S1")
+    state = tmp_path / "local" / "Save States" / "S1.svs"
+    write(state, b"old state", HOUR_AGO)
+    write(tmp_path / "remote" / "Delta" / "SaveState-S1-saveState", b"new state")
+
+    sync_manager = SyncManager(config_manager, None)
+    sync_manager.run_sync()
+    assert state.read_bytes() == b"new state"
+
+    assert not sync_manager.restore_snapshot("S1")
+    assert sync_manager.restore_snapshot("S1", file_id="saveState")
+    assert state.read_bytes() == b"old state"
+    assert len(sync_manager.state_snapshots.history("S1-saveState")) == 2
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_remote_state_snapshot_before_upload_is_opt_in(tmp_path, enabled):
+    config_manager = make_library(tmp_path, [("Game B", "BBB")])
+    config_manager.config["state_snapshot_remote_before_upload"] = enabled
+    add_save_state(tmp_path, "S1")
+    remote = tmp_path / "remote" / "Delta"
+    write(tmp_path / "local" / "Save States" / "S1.svs", b"new state")
+    write(remote / "SaveState-S1-saveState", b"old state", HOUR_AGO)
+
+    sync_manager = SyncManager(config_manager, None)
+    sync_manager.run_sync()
+
+    assert (remote / "SaveState-S1-saveState").read_bytes() == b"new state"
+    history = sync_manager.state_snapshots.history("S1-saveState")
+    assert [e['source'] for e in history] == (["dropbox"] if enabled else [])
+
+
+def test_game_rules_match_exact_names_before_globs(tmp_path):
+    config_manager = make_library(tmp_path, [])
+    config_manager.config.update(
+        include_games=["Pokemon Emerald [Hack]", "zelda*", "abc123"],
+        exclude_games=["zelda ii*"])
+    selected = SyncManager(config_manager, None).game_selected
+
+    assert selected("Pokemon Emerald [Hack]", "X1")
+    assert selected("Zelda: Minish Cap", "X2")
+    assert selected("Anything", "ABC123")
+    assert not selected("Zelda II", "X3")
+    assert not selected("Pokemon Ruby", "X4")
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from throttle import CHUNK_SIZE, PRIORITY_BULK, PRIORITY_INTERACTIVE, TokenBucket
+
+
+def test_reapplying_the_same_rate_keeps_debt():
+    bucket = TokenBucket(1000)
+    bucket.consume(5000)
+    bucket.set_rate(1000)
+    assert bucket.tokens < 0
+
+
+def test_changing_the_rate_refills():
+    bucket = TokenBucket(1000)
+    bucket.consume(5000)
+    bucket.set_rate(2000)
+    assert bucket.tokens == 2000
+
+
+def test_request_size_caps_bursts():
+    assert TokenBucket(0).request_size(4 << 20) == 4 << 20
+    assert TokenBucket(1 << 20).request_size(4 << 20) == 256 * 1024
+    assert TokenBucket(1).request_size(4 << 20) == CHUNK_SIZE
+
+
+def test_interactive_waiters_are_served_before_bulk():
+    bucket = TokenBucket(10000)
+    # put the bucket 0.2s into debt so both waiters queue up
+    bucket.consume(12000)
+    order = []
+
+    def take(priority, name):
+        bucket.consume(100, priority)
+        order.append(name)
+
+    bulk = threading.Thread(target=take, args=(PRIORITY_BULK, "bulk"))
+    bulk.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(
+        target=take, args=(PRIORITY_INTERACTIVE, "interactive"))
+    interactive.start()
+    bulk.join()
+    interactive.join()
+
+    assert order == ["interactive", "bulk"]
+
+
+def test_consume_paces_to_the_rate():
+    bucket = TokenBucket(1000000)
+    bucket.consume(1000000)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.consume(50000)
+    elapsed = time.monotonic() - start
+    # the third request waits for the first two to be paid back
+    assert 0.08 <= elapsed < 0.5
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    start = time.monotonic()
+    bucket.consume(10 ** 12)
+    assert time.monotonic() - start < 0.05
@@ -0,0 +1,120 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+# Lower values are served first when several transfers wait on a bucket
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+# save states are big and can always wait for battery saves
+PRIORITY_STATE = 2
+
+# How many bytes we ask the bucket for at a time while streaming
+CHUNK_SIZE = 64 * 1024
+
+
+class TokenBucket:
+    """Thread-safe token bucket measured in bytes per second.
+
+    A rate of 0 (or None) means unlimited. Callers are allowed to take more
+    than the bucket holds; the bucket then goes into debt and the next waiter
+    sleeps until it has been paid back, so large chunks are still paced to
+    the configured rate. Waiters are queued by priority so small interactive
+    syncs get through ahead of bulk backfills.
+    """
+
+    def __init__(self, rate=0, capacity=None):
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._counter = itertools.count()
+        self.rate = self.capacity = None
+        self.set_rate(rate, capacity)
+
+    def set_rate(self, rate, capacity=None):
+        """Change the rate (bytes/s) without dropping anyone who is waiting"""
+        with self._cond:
+            rate = max(int(rate or 0), 0)
+            # default to one second worth of burst
+            capacity = capacity or rate
+            if (rate, capacity) == (self.rate, self.capacity):
+                # unchanged, keep the current tokens (and any debt)
+                return
+            self.rate = rate
+            self.capacity = capacity
+            self.tokens = self.capacity
+            self.last_refill = time.monotonic()
+            self._cond.notify_all()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    def request_size(self, ceiling):
+        """Largest single request that keeps bursts to a quarter second of budget"""
+        if not self.rate:
+            return ceiling
+        return max(CHUNK_SIZE, min(ceiling, self.rate // 4))
+
+    def consume(self, amount, priority=PRIORITY_BULK):
+        """Block until `amount` bytes may be sent"""
+        if amount <= 0:
+            return
+
+        with self._cond:
+            if not self.rate:
+                return
+
+            ticket = (priority, next(self._counter))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if not self.rate:
+                        return
+                    self._refill()
+                    if self._waiters[0] == ticket and self.tokens > 0:
+                        self.tokens -= amount
+                        return
+                    if self._waiters[0] == ticket:
+                        timeout = -self.tokens / self.rate
+                    else:
+                        # someone more important is ahead of us
+                        timeout = None
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+
+class BandwidthBudget:
+    """Upload and download buckets shared by every transfer in the process"""
+
+    def __init__(self, upload_rate=0, download_rate=0):
+        self.upload = TokenBucket(upload_rate)
+        self.download = TokenBucket(download_rate)
+
+    def configure(self, config):
+        """Apply the limits from a config dict (values are bytes per second)"""
+        self.upload.set_rate(config.get("upload_rate_limit", 0))
+        self.download.set_rate(config.get("download_rate_limit", 0))
+
+
+_shared_budget = BandwidthBudget()
+
+
+def shared_budget(config=None):
+    """Return the process wide budget, optionally refreshing its limits"""
+    if config is not None:
+        _shared_budget.configure(config)
+    return _shared_budget
+
+
+def priority_for(item_count, config):
+    """Small syncs (a single changed save) count as interactive"""
+    threshold = config.get("interactive_sync_threshold", 5)
+    if item_count <= threshold:
+        return PRIORITY_INTERACTIVE
+    return PRIORITY_BULK
@@ -0,0 +1,24 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# process wide pools so running many libraries doesn't multiply threads
+_pools = {}
+_lock = threading.Lock()
+
+
+def shared_pool(name, workers):
+    """Get (or lazily create) the named pool, sized on first use"""
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=max(int(workers), 1),
+                                      thread_name_prefix=name)
+            _pools[name] = pool
+        return pool
+
+
+def shutdown_pools():
+    with _lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=True)
+        _pools.clear()